@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark: import time per module and time to first page render.
+
+    python -m benchmarks.imports
+    python -m benchmarks.imports --runs 5 --modules supabase openai utils.db
+
+Import times come from `python -X importtime` in a fresh interpreter per
+module, after streamlit is loaded (every page pays for streamlit anyway),
+so each figure is what importing that module adds.
+
+First render runs main.py with AppTest in fresh processes against the
+load-test stand-ins. "login" is a new visitor's first page, measured from
+interpreter start. "home" is the run right after signing in, which renders
+the recorder page.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    "supabase",
+    "openai",
+    "pandas",
+    "numpy",
+    "requests",
+    "pydub",
+    "audiorecorder",
+    "utils.db",
+    "utils.sidebar",
+    "utils.clients",
+    "utils.parser",
+    "utils.notes_state",
+    "utils.export",
+    "utils.metrics",
+    "utils.profiler",
+]
+
+# Run in a fresh interpreter; prints the timings as JSON
+FIRST_RENDER_SCRIPT = """
+import time
+start = time.perf_counter()
+import json, sys
+sys.path.insert(0, {root!r})
+from loadtest import run as lt
+from loadtest.stubs import GroqStub, SupabaseStub
+
+supabase = SupabaseStub(notes_per_user=50).start()
+groq = GroqStub().start()
+lt._configure_environment(supabase, groq)
+lt._use_navigation_pages()
+
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(lt.MAIN_SCRIPT, default_timeout=60)
+at.run()
+login = time.perf_counter() - start
+
+at.text_input[0].input("cold-start@example.com")
+at.text_input[1].input("password")
+before = time.perf_counter()
+at.button[0].click().run()
+home = time.perf_counter() - before
+
+errors = [e.message for e in at.exception]
+print(json.dumps({{"login": login, "home": home, "errors": errors}}))
+"""
+
+
+def import_time_us(module: str) -> Optional[int]:
+    """Cumulative import time of module in a fresh interpreter, with streamlit preloaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module and not parts[2].startswith("  "):
+            return int(parts[1])
+    return 0  # Already imported by streamlit
+
+
+def first_render() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_RENDER_SCRIPT.format(root=str(ROOT))],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measure import time and time to first render.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement (median)")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+    runs = max(1, args.runs)
+
+    imports = {}
+    for module in args.modules:
+        samples = [import_time_us(module) for _ in range(runs)]
+        imports[module] = None if None in samples else statistics.median(samples) / 1000
+
+    renders = [first_render() for _ in range(runs)]
+    render = {
+        page: statistics.median(r[page] for r in renders) * 1000
+        for page in ("login", "home")
+    }
+    errors = sorted({e for r in renders for e in r["errors"]})
+
+    print(f"{'module':<24} {'import ms':>10}")
+    for module, ms in sorted(imports.items(), key=lambda item: -(item[1] or 0)):
+        print(f"{module:<24} {'not installed' if ms is None else f'{ms:.1f}':>10}")
+    print(f"\nFirst render (median of {runs}):")
+    print(f"  login page from interpreter start: {render['login']:.0f} ms")
+    print(f"  home page after signing in:        {render['home']:.0f} ms")
+    for error in errors:
+        print(f"  error: {error}")
+
+    results = {"imports_ms": imports, "first_render_ms": render}
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
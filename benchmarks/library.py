@@ -0,0 +1,133 @@
+"""
+Synthetic libraries for benchmarks.
+
+Libraries are generated from a seed, so a size always yields the same books
+and notes. The distributions follow what real users produce: a few books
+hold most of the notes, tags are dominated by "idea" and "quote", about
+60% of notes carry a quote, text lengths are long-tailed and some titles
+contain characters that filenames cannot.
+"""
+
+import random
+import uuid
+from typing import Optional
+
+from structures.book import Book
+from structures.note import Note
+
+# (books, notes) per named size
+SIZES = {
+    "small": (1, 200),
+    "medium": (100, 10_000),
+    "large": (1_000, 100_000),
+    "xlarge": (10_000, 1_000_000),
+}
+
+# Relative frequency of each tag; other tags are rare custom ones
+TAG_WEIGHTS = {
+    "idea": 30, "quote": 25, "remark": 15, "question": 10,
+    "character": 8, "connection": 6, "critique": 4, "summary": 2,
+}
+CUSTOM_TAGS = ["theme", "style", "history", "vocabulary", "à-relire"]
+CUSTOM_TAG_RATE = 0.03
+
+QUOTE_RATE = 0.6
+COMMENT_RATE = 0.85
+NO_PAGE_RATE = 0.15
+NO_TAGS_RATE = 0.03
+NO_CONFIDENCE_RATE = 0.05
+NO_BOOK_RATE = 0.02
+
+WORDS = (
+    "the of and to a in that is was he for it with as his on be at by had "
+    "not are but from or have an they which one you were her all she there "
+    "would their we him been has when who will more no if out so said what "
+    "memory desert river mother letter city winter machine island mirror "
+    "prophecy exile council storm lantern archive orchard voyage silence "
+    "garden betrayal empire spice water ritual promise harvest debt "
+    "mémoire désert été très déjà où leçon naïve cœur "
+).split()
+
+TITLE_WORDS = (
+    "The Last Empire Winter Memory Garden River Silent City Island Mirror "
+    "Storm Archive Orchard Voyage Letters Desert Night House Children Fire"
+).split()
+
+
+def _text(rng: random.Random, mean_words: float, max_words: int) -> str:
+    """Long-tailed sentence(s): log-normal word count around mean_words."""
+    count = min(max_words, max(1, int(rng.lognormvariate(0, 0.6) * mean_words)))
+    words = rng.choices(WORDS, k=count)
+    words[0] = words[0].capitalize()
+    text = " ".join(words) + "."
+    if count > 40 and rng.random() < 0.2:
+        # Some long quotes span paragraphs
+        cut = text.find(" ", len(text) // 2)
+        text = text[:cut] + ".\n" + text[cut + 1:]
+    return text
+
+
+def _tags(rng: random.Random, names: list[str], weights: list[int]) -> Optional[list[str]]:
+    if rng.random() < NO_TAGS_RATE:
+        return None
+    count = rng.choices((1, 2, 3), weights=(55, 35, 10))[0]
+    tags = []
+    for tag in rng.choices(names, weights=weights, k=count):
+        if tag not in tags:
+            tags.append(tag)
+    if rng.random() < CUSTOM_TAG_RATE:
+        tags.append(rng.choice(CUSTOM_TAGS))
+    return tags
+
+
+def generate_books(count: int, rng: random.Random) -> list[Book]:
+    books = []
+    for i in range(count):
+        title = " ".join(rng.choices(TITLE_WORDS, k=rng.randint(1, 4)))
+        if rng.random() < 0.05:
+            title += rng.choice([": A Novel", "? Essays", " / Part II", ' "Revisited"'])
+        books.append(Book(
+            title=f"{title} {i}",
+            author=" ".join(rng.choices(TITLE_WORDS, k=2)),
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+        ))
+    return books
+
+
+def generate_notes(books: list[Book], count: int, rng: random.Random) -> list[Note]:
+    # Zipf-like share of notes per book: a few books hold most of them
+    book_weights = [1 / (rank + 1) ** 1.1 for rank in range(len(books))]
+    assigned = rng.choices(books, weights=book_weights, k=count) if books else [None] * count
+    page_counts = {book.id: rng.randint(150, 900) for book in books}
+
+    tag_names = list(TAG_WEIGHTS)
+    tag_weights = list(TAG_WEIGHTS.values())
+
+    notes = []
+    for book in assigned:
+        if book is not None and rng.random() < NO_BOOK_RATE:
+            book = None
+        quote = _text(rng, 18, 150) if rng.random() < QUOTE_RATE else None
+        comment = _text(rng, 22, 200) if rng.random() < COMMENT_RATE else None
+        content = " ".join(t for t in (quote, comment) if t) or _text(rng, 15, 100)
+        notes.append(Note(
+            content=content,
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            page_number=(
+                None if book is None or rng.random() < NO_PAGE_RATE
+                else rng.randint(1, page_counts[book.id])
+            ),
+            quote=quote,
+            comment=comment,
+            book_id=book.id if book else None,
+            tags=_tags(rng, tag_names, tag_weights),
+            confidence_score=None if rng.random() < NO_CONFIDENCE_RATE else round(rng.betavariate(8, 1.5), 2),
+        ))
+    return notes
+
+
+def generate_library(num_books: int, num_notes: int, seed: int = 0) -> tuple[list[Book], list[Note]]:
+    """Books and notes for a benchmark; the same arguments give the same library."""
+    rng = random.Random(seed)
+    books = generate_books(num_books, rng)
+    return books, generate_notes(books, num_notes, rng)
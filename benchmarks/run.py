@@ -0,0 +1,309 @@
+"""
+Benchmarks for the export and parsing hot paths.
+
+    python -m benchmarks.run                        # compare against baseline.json
+    python -m benchmarks.run --sizes small medium --only generate_csv_export
+    python -m benchmarks.run --save benchmarks/baseline.json
+
+Every benchmark runs in a fresh spawned process on a synthetic library
+(see benchmarks.library), so runs do not share caches or memory:
+
+- cold_s is the first call (no process pool yet),
+- warm_s is the median of the following calls,
+- peak_rss_mb is the process peak, dataset_rss_mb what the library alone took,
+- alloc_peak_mb is the tracemalloc peak of one cold call, measured in a
+  separate process because tracing slows everything down.
+
+Process pool workers used by generate_obsidian_export are not included in
+the RSS figures. parse_note_content runs against a client that replays the
+chat completions in recorded_responses.json, so it measures prompt
+building, response parsing and metrics, not the network.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE = BENCH_DIR / "baseline.json"
+RECORDINGS = BENCH_DIR / "recorded_responses.json"
+
+DEFAULT_SIZES = ["small", "medium", "large"]
+
+# Times each recorded transcript is parsed per call of the benchmark
+PARSE_ROUNDS = 20
+
+# warm_s or alloc_peak_mb above baseline * threshold is a regression
+DEFAULT_THRESHOLD = 1.25
+
+
+def _rss_mb(peak: bool = False) -> float:
+    if not peak:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except OSError:
+            pass
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+# --- Recorded client ---
+
+class RecordedClient:
+    """OpenAI-compatible client that replays recorded chat completions by transcript."""
+
+    base_url = "https://api.groq.com/openai/v1"
+
+    def __init__(self, recordings: list[dict]):
+        self._responses = [(r["transcript"], json.dumps(r["response"])) for r in recordings]
+        self.requests: list[dict] = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, model: str, messages: list[dict], **kwargs):
+        from openai.types.chat import ChatCompletion
+
+        self.requests.append({"model": model, "messages": messages, **kwargs})
+        prompt = messages[-1]["content"]
+        for transcript, response in self._responses:
+            if transcript in prompt:
+                # Parsed from JSON on every call, as the SDK does with a response body
+                return ChatCompletion.model_validate_json(response)
+        raise KeyError(f"No recorded response for: {prompt[:80]}")
+
+
+# --- Benchmarks ---
+# Each takes a size name and returns (function to time, items processed per call)
+
+def _library(size: str):
+    from benchmarks.library import SIZES, generate_library
+
+    return generate_library(*SIZES[size])
+
+
+def bench_format_note_for_obsidian(size: str):
+    from utils.export import format_note_for_obsidian
+
+    _, notes = _library(size)
+
+    def run():
+        for note in notes:
+            format_note_for_obsidian(note)
+
+    return run, len(notes)
+
+
+def bench_generate_book_markdown(size: str):
+    from utils.export import generate_book_markdown
+
+    books, notes = _library(size)
+    by_book: dict[str, list] = {}
+    for note in notes:
+        if note.book_id:
+            by_book.setdefault(note.book_id, []).append(note)
+    # The book with the most notes: the worst case users hit
+    book = max(books, key=lambda b: len(by_book.get(b.id, ())))
+    book_notes = by_book.get(book.id, [])
+    return lambda: generate_book_markdown(book, book_notes), len(book_notes)
+
+
+def bench_generate_csv_export(size: str):
+    from utils.export import generate_csv_export
+
+    books, notes = _library(size)
+    return lambda: generate_csv_export(books, notes), len(notes)
+
+
+def bench_generate_obsidian_export(size: str):
+    from utils.export import generate_obsidian_export
+
+    books, notes = _library(size)
+    return lambda: generate_obsidian_export(books, notes), len(notes)
+
+
+def bench_parse_note_content(size: str):
+    import streamlit as st
+
+    from structures.book import Book
+    from utils.parser import parse_note_content
+
+    recordings = json.loads(RECORDINGS.read_text(encoding="utf-8"))
+    client = RecordedClient(recordings)
+    cases = [
+        (r["transcript"], Book(**r["book"]) if r["book"] else None,
+         json.loads(r["response"]["choices"][0]["message"]["content"]))
+        for r in recordings
+    ]
+
+    def run():
+        for _ in range(PARSE_ROUNDS):
+            for transcript, book, expected in cases:
+                st.session_state.current_book_obj = book
+                if parse_note_content(transcript, client) != expected:
+                    raise AssertionError(f"Unexpected parse for: {transcript}")
+
+    return run, PARSE_ROUNDS * len(cases)
+
+
+BENCHMARKS: dict[str, Callable] = {
+    "format_note_for_obsidian": bench_format_note_for_obsidian,
+    "generate_book_markdown": bench_generate_book_markdown,
+    "generate_csv_export": bench_generate_csv_export,
+    "generate_obsidian_export": bench_generate_obsidian_export,
+    "parse_note_content": bench_parse_note_content,
+}
+
+# Benchmarks whose input does not depend on the library size
+SIZE_INDEPENDENT = {"parse_note_content": "recorded"}
+
+
+# --- Measurement (runs in a child process) ---
+
+def _quiet():
+    # Bare-mode st.session_state warns about the missing script context on every access
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def _time(name: str, size: str, repeat: int) -> dict:
+    _quiet()
+    run, items = BENCHMARKS[name](size)
+    dataset_rss = _rss_mb()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    warm = statistics.median(times[1:]) if len(times) > 1 else times[0]
+    return {
+        "items": items,
+        "cold_s": times[0],
+        "warm_s": warm,
+        "per_item_us": warm / items * 1e6 if items else 0.0,
+        "dataset_rss_mb": dataset_rss,
+        "peak_rss_mb": _rss_mb(peak=True),
+    }
+
+
+def _trace(name: str, size: str) -> dict:
+    _quiet()
+    run, _ = BENCHMARKS[name](size)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"alloc_peak_mb": peak / 2**20}
+
+
+def _in_child(fn: Callable, *args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def _round(value, digits: int = 4):
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}")
+    return value
+
+
+def measure(name: str, size: str, repeat: int, trace_alloc: bool) -> dict:
+    result = _in_child(_time, name, size, repeat)
+    if trace_alloc:
+        result.update(_in_child(_trace, name, size))
+    return {k: _round(v) for k, v in result.items()}
+
+
+# --- Reporting ---
+
+def _machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _ratio(current: Optional[float], previous: Optional[float]) -> Optional[float]:
+    if not current or not previous:
+        return None
+    return current / previous
+
+
+def _print_results(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    header = (f"{'benchmark':<38} {'items':>8} {'cold ms':>10} {'warm ms':>10} {'µs/item':>9} "
+              f"{'rss MB':>8} {'alloc MB':>9} {'vs base':>8}")
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        base = baseline.get(key, {})
+        time_ratio = _ratio(r["warm_s"], base.get("warm_s"))
+        alloc_ratio = _ratio(r.get("alloc_peak_mb"), base.get("alloc_peak_mb"))
+        flag = ""
+        if (time_ratio or 0) > threshold or (alloc_ratio or 0) > threshold:
+            flag = " !"
+            regressions.append(key)
+        vs = f"{time_ratio:.2f}x" if time_ratio else "-"
+        alloc = f"{r['alloc_peak_mb']:.1f}" if "alloc_peak_mb" in r else "-"
+        print(f"{key:<38} {r['items']:>8} {r['cold_s'] * 1000:>10.1f} {r['warm_s'] * 1000:>10.1f} "
+              f"{r['per_item_us']:>9.2f} {r['peak_rss_mb']:>8.1f} {alloc:>9} {vs:>8}{flag}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    from benchmarks.library import SIZES
+
+    parser = argparse.ArgumentParser(description="Benchmark the export and parsing hot paths.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="calls per benchmark (first one is cold)")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="results to compare against")
+    parser.add_argument("--save", type=Path, help="write the results, e.g. to update the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--check", action="store_true", help="exit with 1 on a regression")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        sizes = [SIZE_INDEPENDENT[name]] if name in SIZE_INDEPENDENT else args.sizes
+        for size in sizes:
+            key = f"{name}/{size}"
+            print(f"Running {key}...", file=sys.stderr)
+            results[key] = measure(name, size, max(1, args.repeat), not args.no_alloc)
+
+    print()
+    regressions = _print_results(results, baseline, args.threshold)
+    if baseline:
+        print(f"\nCompared with {args.baseline}; ! marks warm time or allocations above {args.threshold}x.")
+
+    if args.save:
+        args.save.write_text(json.dumps({"machine": _machine(), "results": results}, indent=2, sort_keys=True) + "\n")
+        print(f"Saved to {args.save}")
+
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+Load test: simulated users driving the app headlessly, against local stand-ins.
+
+    python -m loadtest.run --users 20 --iterations 5 --groq-latency-ms 400 --groq-rpm 300
+
+Each user is a Streamlit AppTest session running main.py in its own
+process: it signs in, then repeatedly records a note (a generated WAV
+injected into the recorder component, so ffmpeg is needed as in
+production), browses the notes page and opens the export dialog. Supabase
+and Groq are replaced by the stubs in loadtest.stubs, served from the
+parent process, so nothing leaves the machine.
+
+AppTest keeps per-run state in globals, so sessions sharing a process
+interfere with each other, and would share one GIL. Separate processes keep
+the numbers about the app. Users start together once every process has
+imported the app and run the scenario once.
+
+Reports per-action latency percentiles, throughput, stub traffic and the
+memory a session adds to its process. Script time is measured server-side:
+it excludes the browser, like the pipeline metrics.
+"""
+
+import argparse
+import base64
+import gc
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import wave
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from loadtest.stubs import GroqStub, SupabaseStub
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = str(ROOT / "main.py")
+
+# Seconds before a single script run counts as hung
+RUN_TIMEOUT = 120
+
+# Seconds allowed for every user process to start, import the app and warm up
+SETUP_TIMEOUT = 600
+
+
+@dataclass
+class Sample:
+    action: str
+    seconds: float
+    ok: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class UserStats:
+    samples: list[Sample] = field(default_factory=list)
+    # RSS of the user's process after the warm-up run, once its session is
+    # warm, and at its peak
+    rss_before: int = 0
+    rss_ready: int = 0
+    rss_peak: int = 0
+
+
+def make_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    """Mono 16-bit sine tone, standing in for a recorded voice note."""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        value = int(8000 * math.sin(2 * math.pi * 220 * i / rate))
+        frames += value.to_bytes(2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def peak_rss_bytes() -> int:
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_rss_bytes()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+class SimulatedUser:
+    """One browser session: an AppTest instance plus the scenario it plays."""
+
+    def __init__(self, index: int, audio_b64: str, think_ms: float, stats: UserStats):
+        from streamlit.testing.v1 import AppTest
+
+        self.email = f"loadtest-{index}@example.com"
+        self.at = AppTest.from_file(MAIN_SCRIPT, default_timeout=RUN_TIMEOUT)
+        self.audio_b64 = audio_b64
+        self.think_ms = think_ms
+        self.stats = stats
+        self.rng = random.Random(index)
+
+    def _step(self, action: str, fn):
+        start = time.perf_counter()
+        error = None
+        try:
+            fn()
+            if self.at.exception:
+                error = self.at.exception[0].message
+            elif self.at.error:
+                error = self.at.error[0].value
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.stats.samples.append(Sample(action, time.perf_counter() - start, error is None, error))
+        if self.think_ms:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_ms / 1000)
+
+    def login(self):
+        def sign_in():
+            self.at.run()
+            self.at.text_input[0].input(self.email)
+            self.at.text_input[1].input("loadtest-password")
+            self.at.button[0].click().run()
+            if not self.at.session_state["user"]:
+                raise RuntimeError("still on the login page")
+
+        self._step("login", sign_in)
+
+    def record(self):
+        def record_note():
+            at = self.at
+            at.switch_page("pages/recorder.py").run()
+            key = at.session_state["recorder_key"]
+            at.session_state[f"recorder_{key}"] = self.audio_b64
+            at.run()
+            if "pending_duplicate" in at.session_state and at.session_state["pending_duplicate"]:
+                next(b for b in at.button if b.label == "Save anyway").click().run()
+            if at.session_state["recorder_key"] == key:
+                raise RuntimeError(at.error[0].value if at.error else "note was not saved")
+
+        self._step("record", record_note)
+
+    def browse(self):
+        def browse_notes():
+            at = self.at
+            at.switch_page("pages/notes.py").run()
+            page = next((n for n in at.number_input if n.key == "notes_page"), None)
+            if page is not None and page.max > 1:
+                page.set_value(self.rng.randint(2, page.max)).run()
+
+        self._step("browse", browse_notes)
+
+    def export(self):
+        def open_export():
+            at = self.at
+            if "notes" not in at.session_state:
+                at.switch_page("pages/notes.py").run()
+            next(b for b in at.button if b.label.strip() == "Export").click().run()
+
+        self._step("export", open_export)
+
+    def play(self, iterations: int, on_warm=None):
+        self.login()
+        for i in range(iterations):
+            self.record()
+            self.browse()
+            self.export()
+            if i == 0 and on_warm is not None:
+                on_warm()
+
+
+def _use_navigation_pages():
+    """
+    Keep AppTest on st.navigation pages, like the server.
+
+    AppTest resets PagesManager.uses_pages_directory on every run, and since
+    pages/ exists it would run the legacy directory-based pages: the second
+    run of a session executes pages/recorder.py without main.py. The server
+    detects that flag once and clears it for good at the first st.navigation.
+    """
+    from streamlit.runtime.pages_manager import PagesManager
+
+    init = PagesManager.__init__
+
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        PagesManager.uses_pages_directory = False
+
+    PagesManager.__init__ = __init__
+
+
+def _configure_environment(supabase: SupabaseStub, groq: GroqStub):
+    import streamlit as st
+
+    try:
+        configured = st.secrets.get("SUPABASE_URL")
+    except (FileNotFoundError, AttributeError):
+        configured = None
+    if configured:
+        raise SystemExit("SUPABASE_URL is set in .streamlit/secrets.toml; move it aside so the "
+                         "load test cannot reach a real project.")
+
+    os.environ.update({
+        "SUPABASE_URL": supabase.url,
+        "SUPABASE_KEY": "loadtest-anon-key",
+        "GROQ_API_KEY": "loadtest",
+        "GROQ_BASE_URL": f"{groq.url}/openai/v1",
+    })
+    for env in ("MARGINAL_PROFILE", "MARGINAL_PROFILE_TOKEN", "METRICS_PORT"):
+        os.environ.pop(env, None)
+
+
+def _run_user(index: int, args, audio_b64: str, start, results):
+    """
+    Process entry point for one simulated user.
+
+    Warms up with a throwaway session, waits on start for the other users,
+    plays the scenario and puts its UserStats on results.
+    """
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _use_navigation_pages()
+    sys.path.insert(0, str(ROOT))
+
+    stats = UserStats()
+    user = None
+    try:
+        # Run the scenario once so the baseline includes the app's imports
+        SimulatedUser(-1 - index, audio_b64, 0, UserStats()).play(1)
+        gc.collect()
+        stats.rss_before = rss_bytes()
+        user = SimulatedUser(index, audio_b64, args.think_ms, stats)
+    except Exception as e:
+        stats.samples.append(Sample("setup", 0.0, False, f"{type(e).__name__}: {e}"))
+    start.wait(SETUP_TIMEOUT)
+
+    def on_warm():
+        gc.collect()
+        stats.rss_ready = rss_bytes()
+
+    if user is not None:
+        user.play(args.iterations, on_warm)
+    stats.rss_peak = peak_rss_bytes()
+    results.put((index, asdict(stats)))
+
+
+def _report(args, stats: list[UserStats], wall: float, supabase_requests: int, groq: dict) -> dict:
+    samples = [s for user in stats for s in user.samples]
+    actions = {}
+    for name in ("login", "record", "browse", "export"):
+        rows = [s for s in samples if s.action == name]
+        if not rows:
+            continue
+        times = [s.seconds for s in rows if s.ok]
+        actions[name] = {
+            "count": len(rows),
+            "errors": sum(not s.ok for s in rows),
+            "p50_ms": round(_percentile(times, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(times, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(times, 0.99) * 1000, 1),
+            "max_ms": round(max(times, default=0.0) * 1000, 1),
+        }
+
+    errors: dict[str, int] = {}
+    for s in samples:
+        if s.error:
+            errors[s.error[:120]] = errors.get(s.error[:120], 0) + 1
+
+    return {
+        "users": args.users,
+        "iterations": args.iterations,
+        "wall_seconds": round(wall, 2),
+        "actions_per_second": round(len(samples) / wall, 2) if wall else 0.0,
+        "notes_per_second": round(sum(s.ok for s in samples if s.action == "record") / wall, 2) if wall else 0.0,
+        "actions": actions,
+        "errors": errors,
+        "supabase_requests": supabase_requests,
+        "groq_requests": groq["requests"],
+        "groq_rate_limited": groq["rate_limited"],
+        "groq_prompt_tokens": groq["prompt_tokens"],
+        "groq_cached_tokens": groq["cached_tokens"],
+        "rss_baseline_mb": round(statistics.mean(u.rss_before for u in stats) / 2**20, 1),
+        "rss_peak_mb": round(max(u.rss_peak for u in stats) / 2**20, 1),
+        "mb_per_session": round(statistics.mean(u.rss_ready - u.rss_before for u in stats) / 2**20, 2),
+    }
+
+
+def _print_report(report: dict):
+    print(f"\n{report['users']} users x {report['iterations']} iterations in {report['wall_seconds']} s")
+    print(f"Throughput: {report['actions_per_second']} actions/s, {report['notes_per_second']} notes/s")
+    print(f"\n{'action':<8} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, a in report["actions"].items():
+        print(f"{name:<8} {a['count']:>6} {a['errors']:>6} {a['p50_ms']:>9} {a['p95_ms']:>9} "
+              f"{a['p99_ms']:>9} {a['max_ms']:>9}")
+    print(f"\nSupabase requests: {report['supabase_requests']}")
+    print(f"Groq requests: {report['groq_requests']} ({report['groq_rate_limited']} rate limited)")
+    if report["groq_prompt_tokens"]:
+        cached = report["groq_cached_tokens"] / report["groq_prompt_tokens"]
+        print(f"Groq prompt tokens: {report['groq_prompt_tokens']} ({cached:.0%} served from the prompt cache)")
+    print(f"Memory per user process: {report['rss_baseline_mb']} MB baseline, "
+          f"{report['rss_peak_mb']} MB peak, {report['mb_per_session']} MB added by the session")
+    if report["errors"]:
+        print("\nErrors:")
+        for message, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+            print(f"  {count:>4} x {message}")
+
+
+def _groq_counters(groq: GroqStub) -> dict:
+    return {
+        "requests": groq.requests,
+        "rate_limited": groq.rate_limited,
+        "prompt_tokens": groq.prompt_tokens,
+        "cached_tokens": groq.cached_tokens,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="record/browse/export loops per user")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between actions")
+    parser.add_argument("--books", type=int, default=5, help="books seeded per user")
+    parser.add_argument("--notes", type=int, default=200, help="notes seeded per user")
+    parser.add_argument("--audio-seconds", type=float, default=3.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=20)
+    parser.add_argument("--supabase-jitter-ms", type=float, default=10)
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--groq-jitter-ms", type=float, default=200)
+    parser.add_argument("--groq-rpm", type=float, default=None, help="Groq requests per minute before 429s")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.iterations < 1:
+        parser.error("--users and --iterations must be at least 1")
+
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    supabase = SupabaseStub(args.books, args.notes, args.supabase_latency_ms, args.supabase_jitter_ms).start()
+    groq = GroqStub(args.groq_latency_ms, args.groq_jitter_ms, args.groq_rpm).start()
+    # Set before spawning: the user processes inherit the environment
+    _configure_environment(supabase, groq)
+
+    audio_b64 = base64.b64encode(make_wav(args.audio_seconds)).decode()
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(args.users + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_run_user, args=(i, args, audio_b64, start, results), daemon=True)
+        for i in range(args.users)
+    ]
+    for process in processes:
+        process.start()
+
+    # Warm-up traffic is not part of the run
+    start.wait(SETUP_TIMEOUT)
+    supabase_before = supabase.requests
+    groq_before = _groq_counters(groq)
+    began = time.perf_counter()
+
+    stats = [UserStats() for _ in range(args.users)]
+    for _ in range(args.users):
+        index, data = results.get(timeout=RUN_TIMEOUT * args.iterations * 4)
+        stats[index] = UserStats(**{**data, "samples": [Sample(**s) for s in data["samples"]]})
+    wall = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    groq_after = _groq_counters(groq)
+    report = _report(
+        args, stats, wall, supabase.requests - supabase_before,
+        {key: groq_after[key] - groq_before[key] for key in groq_after},
+    )
+    supabase.stop()
+    groq.stop()
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+"""
+Local stand-ins for the remote services, for load testing.
+
+SupabaseStub answers the GoTrue and PostgREST endpoints the app uses
+(password sign-in, token refresh, /auth/v1/user and table reads and
+writes with the filters found in the code), keeping rows in memory and
+scoping them to the caller like the RLS policies do. GroqStub is an
+OpenAI-compatible endpoint for transcriptions and chat completions.
+
+Both add configurable latency, and GroqStub can rate-limit with 429s like
+the real API, so the app's retry behavior is part of the measurement.
+"""
+
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from utils.parser import PREDEFINED_TAGS
+
+# Deterministic user ids from emails, so reruns reuse the seeded library
+USER_NAMESPACE = uuid.UUID("5b8f5e57-4a4b-4d0c-9a53-9d3f1c3c7a10")
+
+# Primary key and user-scoping column of each table
+TABLES = {
+    "books": ("id", "user_id"),
+    "notes": ("id", "user_id"),
+    "export_manifests": ("user_id", "user_id"),
+    "book_summaries": ("book_id,chunk", "user_id"),
+}
+
+WORDS = (
+    "desert spice water ritual emperor betrayal memory garden river silence "
+    "mother war letter promise city winter harvest machine island mirror "
+    "prophecy exile council storm lantern archive orchard debt voyage"
+).split()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def make_token(user_id: str, email: str, ttl: int = 3600) -> str:
+    """Unsigned JWT with the claims supabase-py reads (sub, exp)."""
+    payload = {"sub": user_id, "email": email, "exp": int(time.time()) + ttl,
+               "role": "authenticated", "aud": "authenticated"}
+    return f"{_b64({'alg': 'HS256', 'typ': 'JWT'})}.{_b64(payload)}.{_b64({'sig': 'stub'})}"
+
+
+def _token_claims(token: str) -> Optional[dict]:
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+class _Latency:
+    """Fixed latency plus uniform jitter, in milliseconds."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def sleep(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+class _RateLimiter:
+    """Token bucket refilled at requests_per_minute; None disables it."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.rate = requests_per_minute / 60 if requests_per_minute else None
+        self.capacity = max(1.0, (self.rate or 0) * 5)  # Bursts of about 5 seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Optional[float]:
+        """Takes a token; returns None, or the seconds to wait before retrying."""
+        if self.rate is None:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+
+class _StubServer:
+    """ThreadingHTTPServer on an ephemeral port, run in a daemon thread."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency = _Latency(latency_ms, jitter_ms)
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0):
+        stub = self
+
+        class Handler(self.handler_class):
+            pass
+
+        Handler.stub = stub
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name=type(self).__name__).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    stub: "_StubServer"
+    protocol_version = "HTTP/1.1"
+    _request_body: Optional[bytes] = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        # Read once per request; _dispatch drains it so keep-alive connections stay in sync
+        if self._request_body is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self._request_body = self.rfile.read(length) if length else b""
+        return self._request_body
+
+    def _json(self, status: int, data, headers: Optional[dict] = None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self):
+        self._request_body = None
+        self.stub.requests += 1
+        self.stub.latency.sleep()
+        try:
+            self.route(self.command, urlsplit(self.path))
+        except Exception as e:
+            self._json(500, {"message": str(e)})
+        self._body()
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+    def route(self, method: str, url):
+        self._json(404, {"message": "Not found"})
+
+
+# --- Supabase (GoTrue + PostgREST) ---
+
+def _parse_list(value: str) -> list[str]:
+    """Items of a PostgREST list literal: (a,"b,c",d)."""
+    items = re.findall(r'"((?:[^"\\]|\\.)*)"|([^,]+)', value.strip("()"))
+    return [quoted.replace('\\"', '"') if quoted else bare for quoted, bare in items]
+
+
+def _compare(value, operand: str) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value) - float(operand)
+    except (TypeError, ValueError):
+        return (str(value) > operand) - (str(value) < operand)
+
+
+def _key_of(row: dict, key: str) -> tuple:
+    """Primary or conflict key of a row; key may list several columns."""
+    return tuple(row.get(column) for column in key.split(","))
+
+
+def _cell(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, operand = expression.partition(".")
+    value = row.get(column)
+
+    if op == "eq":
+        result = value is not None and _cell(value) == operand
+    elif op == "neq":
+        result = value is not None and _cell(value) != operand
+    elif op == "in":
+        result = value is not None and _cell(value) in _parse_list(operand)
+    elif op == "is":
+        result = value is None if operand == "null" else _cell(value) == operand
+    elif op in ("gt", "gte", "lt", "lte"):
+        diff = _compare(value, operand)
+        result = diff is not None and {
+            "gt": diff > 0, "gte": diff >= 0, "lt": diff < 0, "lte": diff <= 0
+        }[op]
+    elif op == "cs":
+        result = isinstance(value, list) and set(_parse_list(operand.strip("{}"))) <= set(value)
+    else:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    return not result if negate else result
+
+
+class _SupabaseHandler(_JSONHandler):
+    stub: "SupabaseStub"
+
+    def route(self, method: str, url):
+        if url.path.startswith("/auth/v1/"):
+            self._auth(method, url.path[len("/auth/v1/"):], dict(parse_qsl(url.query)))
+        elif url.path.startswith("/rest/v1/rpc/"):
+            self._rpc(url.path[len("/rest/v1/rpc/"):])
+        elif url.path.startswith("/rest/v1/"):
+            self._rest(method, url.path[len("/rest/v1/"):], parse_qsl(url.query, keep_blank_values=True))
+        else:
+            self._json(404, {"message": "Not found"})
+
+    # --- GoTrue ---
+
+    def _auth(self, method: str, endpoint: str, query: dict):
+        stub = self.stub
+        if endpoint == "token" and query.get("grant_type") == "password":
+            credentials = json.loads(self._body() or b"{}")
+            self._json(200, stub.session_for(credentials.get("email", "")))
+        elif endpoint == "token" and query.get("grant_type") == "refresh_token":
+            refresh_token = json.loads(self._body() or b"{}").get("refresh_token", "")
+            email = stub.refresh_tokens.get(refresh_token)
+            if email is None:
+                self._json(400, {"error": "invalid_grant", "error_description": "Invalid Refresh Token"})
+            else:
+                self._json(200, stub.session_for(email))
+        elif endpoint == "signup":
+            credentials = json.loads(self._body() or b"{}")
+            self._json(200, stub.user_for(credentials.get("email", "")))
+        elif endpoint == "user":
+            claims = self._claims()
+            if not claims:
+                self._json(401, {"message": "Invalid token"})
+            else:
+                self._json(200, stub.user_for(claims["email"]))
+        elif endpoint == "logout":
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._json(404, {"message": f"Unsupported auth endpoint {endpoint}"})
+
+    def _claims(self) -> Optional[dict]:
+        auth = self.headers.get("Authorization", "")
+        claims = _token_claims(auth.removeprefix("Bearer ").strip())
+        if claims and claims.get("sub") and claims.get("exp", 0) > time.time():
+            return claims
+        return None
+
+    # --- PostgREST ---
+
+    def _rest(self, method: str, table: str, params: list[tuple[str, str]]):
+        if table not in TABLES:
+            self._json(404, {"message": f"relation \"{table}\" does not exist"})
+            return
+
+        claims = self._claims()
+        user_id = claims["sub"] if claims else None
+        filters = [(k, v) for k, v in params if k not in ("select", "order", "limit", "offset", "on_conflict", "columns")]
+        options = dict(params)
+        prefer = self.headers.get("Prefer", "")
+
+        if method == "GET":
+            rows = self.stub.select(table, user_id, filters)
+            rows = self._order(rows, options.get("order"))
+            offset = int(options.get("offset", 0))
+            limit = options.get("limit")
+            rows = rows[offset:offset + int(limit) if limit else None]
+            self._json(200, self._project(rows, options.get("select", "*")))
+            return
+
+        if method == "DELETE":
+            rows = self.stub.delete(table, user_id, filters)
+        elif method == "PATCH":
+            rows = self.stub.update(table, user_id, filters, json.loads(self._body() or b"{}"))
+        elif method == "POST":
+            payload = json.loads(self._body() or b"[]")
+            rows = payload if isinstance(payload, list) else [payload]
+            if "resolution=" in prefer:
+                rows = self.stub.upsert(table, user_id, rows, options.get("on_conflict"),
+                                        ignore_duplicates="ignore-duplicates" in prefer)
+            else:
+                rows, conflict = self.stub.insert(table, user_id, rows)
+                if conflict:
+                    self._json(409, {"code": "23505", "message": "duplicate key value violates unique constraint"})
+                    return
+        else:
+            self._json(405, {"message": f"Unsupported method {method}"})
+            return
+
+        data = self._project(rows, options.get("select", "*")) if "return=representation" in prefer else []
+        self._json(201 if method == "POST" else 200, data)
+
+    def _rpc(self, function: str):
+        claims = self._claims()
+        user_id = claims["sub"] if claims else None
+        args = json.loads(self._body() or b"{}")
+        if function == "edit_note_tags":
+            self._json(200, self.stub.edit_note_tags(user_id, args["note_ids"], args["added"], args["removed"]))
+        else:
+            self._json(404, {"message": f"Unknown function {function}"})
+
+    @staticmethod
+    def _order(rows: list[dict], order: Optional[str]) -> list[dict]:
+        for term in reversed((order or "").split(",")):
+            if not term:
+                continue
+            column, *modifiers = term.split(".")
+            descending = "desc" in modifiers
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: r[column], reverse=descending)
+            # PostgREST puts nulls last on asc and first on desc by default
+            rows = missing + present if descending else present + missing
+        return rows
+
+    @staticmethod
+    def _project(rows: list[dict], select: str) -> list[dict]:
+        columns = [c.strip() for c in select.split(",") if c.strip()]
+        if not columns or "*" in columns:
+            return [dict(r) for r in rows]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+
+class SupabaseStub(_StubServer):
+    """In-memory GoTrue and PostgREST stand-in, seeding each new user's library."""
+
+    handler_class = _SupabaseHandler
+
+    def __init__(self, books_per_user: int = 5, notes_per_user: int = 200,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        super().__init__(latency_ms, jitter_ms)
+        self.books_per_user = books_per_user
+        self.notes_per_user = notes_per_user
+        self.seed = seed
+        self.rows: dict[str, list[dict]] = {table: [] for table in TABLES}
+        self.refresh_tokens: dict[str, str] = {}
+        self._users: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    # --- Auth ---
+
+    def user_for(self, email: str) -> dict:
+        with self._lock:
+            user = self._users.get(email)
+            if user is None:
+                user = self._users[email] = {
+                    "id": str(uuid.uuid5(USER_NAMESPACE, email)),
+                    "aud": "authenticated",
+                    "role": "authenticated",
+                    "email": email,
+                    "app_metadata": {"provider": "email"},
+                    "user_metadata": {},
+                    "created_at": _now(),
+                }
+                self._seed_library(user["id"])
+            return user
+
+    def session_for(self, email: str) -> dict:
+        user = self.user_for(email)
+        refresh_token = uuid.uuid4().hex
+        with self._lock:
+            self.refresh_tokens[refresh_token] = email
+        return {
+            "access_token": make_token(user["id"], email),
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "expires_at": int(time.time()) + 3600,
+            "user": user,
+        }
+
+    def _seed_library(self, user_id: str):
+        rng = random.Random(f"{self.seed}:{user_id}")
+        book_ids = []
+        for i in range(self.books_per_user):
+            book_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            book_ids.append(book_id)
+            self.rows["books"].append({
+                "id": book_id, "user_id": user_id, "title": f"{sentence(rng, 3)[:-1]} {i}",
+                "author": sentence(rng, 2)[:-1], "created_at": _now(),
+            })
+        for _ in range(self.notes_per_user):
+            self.rows["notes"].append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user_id,
+                "book_id": rng.choice(book_ids) if book_ids and rng.random() > 0.05 else None,
+                "content": sentence(rng, rng.randint(8, 40)),
+                "page_number": rng.randint(1, 600) if rng.random() > 0.2 else None,
+                "quote": sentence(rng, rng.randint(5, 25)) if rng.random() > 0.4 else None,
+                "comment": sentence(rng, rng.randint(5, 30)),
+                "tags": rng.sample(PREDEFINED_TAGS, rng.randint(1, 3)),
+                "confidence_score": round(rng.uniform(0.4, 1.0), 2),
+                "created_at": _now(),
+            })
+
+    # --- Tables ---
+
+    def _visible(self, table: str, user_id: Optional[str], filters) -> list[dict]:
+        owner = TABLES[table][1]
+        return [
+            row for row in self.rows[table]
+            if user_id is not None and row.get(owner) == user_id
+            and all(_matches(row, column, expression) for column, expression in filters)
+        ]
+
+    def select(self, table: str, user_id: Optional[str], filters) -> list[dict]:
+        with self._lock:
+            return self._visible(table, user_id, filters)
+
+    def insert(self, table: str, user_id: Optional[str], rows: list[dict]) -> tuple[list[dict], bool]:
+        key, owner = TABLES[table]
+        with self._lock:
+            existing = {_key_of(row, key) for row in self.rows[table]}
+            new_rows = []
+            for row in rows:
+                row = dict(row)
+                if row.get(owner) != user_id:
+                    raise PermissionError("new row violates row-level security policy")
+                if key == "id" and not row.get("id"):
+                    row["id"] = str(uuid.uuid4())
+                if _key_of(row, key) in existing:
+                    return [], True
+                row.setdefault("created_at", _now())
+                existing.add(_key_of(row, key))
+                new_rows.append(row)
+            self.rows[table].extend(new_rows)
+            return new_rows, False
+
+    def upsert(self, table: str, user_id: Optional[str], rows: list[dict],
+               on_conflict: Optional[str], ignore_duplicates: bool) -> list[dict]:
+        key, owner = TABLES[table]
+        key = on_conflict or key
+        with self._lock:
+            by_key = {_key_of(row, key): row for row in self.rows[table]}
+            written = []
+            for row in rows:
+                if row.get(owner) != user_id:
+                    raise PermissionError("new row violates row-level security policy")
+                current = by_key.get(_key_of(row, key))
+                if current is None:
+                    row = dict(row)
+                    row.setdefault("created_at", _now())
+                    self.rows[table].append(row)
+                    by_key[_key_of(row, key)] = row
+                    written.append(row)
+                elif not ignore_duplicates:
+                    current.update(row)
+                    written.append(current)
+            return written
+
+    def update(self, table: str, user_id: Optional[str], filters, values: dict) -> list[dict]:
+        with self._lock:
+            rows = self._visible(table, user_id, filters)
+            for row in rows:
+                row.update(values)
+            return rows
+
+    def edit_note_tags(self, user_id: Optional[str], note_ids: list[str],
+                       added: list[str], removed: list[str]) -> list[dict]:
+        """Same result as the edit_note_tags SQL function."""
+        note_ids = set(note_ids)
+        with self._lock:
+            changed = []
+            for note in self._visible("notes", user_id, []):
+                if note["id"] not in note_ids:
+                    continue
+                tags = note.get("tags") or []
+                edited = [t for t in dict.fromkeys(tags + added) if t not in removed]
+                if edited != tags:
+                    note["tags"] = edited
+                    changed.append({"id": note["id"], "tags": edited})
+            return changed
+
+    def delete(self, table: str, user_id: Optional[str], filters) -> list[dict]:
+        with self._lock:
+            rows = self._visible(table, user_id, filters)
+            deleted = {id(row) for row in rows}
+            self.rows[table] = [row for row in self.rows[table] if id(row) not in deleted]
+            if table == "books":
+                # notes.book_id and book_summaries.book_id reference books(id) on delete cascade
+                book_ids = {row["id"] for row in rows}
+                for child in ("notes", "book_summaries"):
+                    self.rows[child] = [r for r in self.rows[child] if r.get("book_id") not in book_ids]
+            return rows
+
+
+# --- Groq (OpenAI-compatible) ---
+
+PAGE_RE = re.compile(r"\bpage (\d+)", re.IGNORECASE)
+
+
+class _GroqHandler(_JSONHandler):
+    stub: "GroqStub"
+
+    def route(self, method: str, url):
+        if method != "POST" or not url.path.startswith("/openai/v1/"):
+            self._json(404, {"error": {"message": "Not found"}})
+            return
+
+        body = self._body()
+        retry_after = self.stub.limiter.acquire()
+        if retry_after is not None:
+            self.stub.rate_limited += 1
+            self._json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       headers={"retry-after": f"{retry_after:.2f}"})
+            return
+
+        endpoint = url.path[len("/openai/v1/"):]
+        if endpoint == "audio/transcriptions":
+            self._json(200, {"text": self.stub.next_transcript()})
+        elif endpoint == "chat/completions":
+            self._json(200, self.stub.completion(json.loads(body or b"{}")))
+        else:
+            self._json(404, {"error": {"message": f"Unsupported endpoint {endpoint}"}})
+
+
+class GroqStub(_StubServer):
+    """OpenAI-compatible transcription and chat endpoint with latency and rate limits."""
+
+    handler_class = _GroqHandler
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 requests_per_minute: Optional[float] = None, seed: int = 0):
+        super().__init__(latency_ms, jitter_ms)
+        self.limiter = _RateLimiter(requests_per_minute)
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_prompts: set[tuple[str, str]] = set()
+
+    def next_transcript(self) -> str:
+        with self._lock:
+            page = self._rng.randint(1, 600)
+            return f"Page {page}. It says {sentence(self._rng, 10)} I think {sentence(self._rng, 14)}"
+
+    def completion(self, request: dict) -> dict:
+        messages = request.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        try:
+            batch = json.loads(prompt)
+        except ValueError:
+            batch = None
+
+        with self._lock:
+            if "response_format" not in request:
+                # Free text: a book or page range summary
+                content = " ".join(sentence(self._rng, 16) for _ in range(4))
+            elif isinstance(batch, dict) and "notes" in batch:
+                content = {"tags": [self._rng.sample(PREDEFINED_TAGS, 2) for _ in batch["notes"]]}
+            else:
+                transcript = prompt.rpartition("Transcript: ")[2]
+                page = PAGE_RE.search(transcript)
+                quote, _, comment = transcript.partition("It says")[2].partition("I think")
+                content = {
+                    "page_number": int(page.group(1)) if page else None,
+                    "quote": quote.strip() or None,
+                    "comment": comment.strip() or transcript,
+                    "tags": self._rng.sample(PREDEFINED_TAGS, self._rng.randint(1, 3)),
+                    "confidence_score": round(self._rng.uniform(0.6, 1.0), 2),
+                }
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        # Like provider prompt caching: a system prompt the model has seen is served from cache
+        system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+        key = (request.get("model", ""), system)
+        with self._lock:
+            cached_tokens = len(system) // 4 if key in self._seen_prompts else 0
+            self._seen_prompts.add(key)
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        text = content if isinstance(content, str) else json.dumps(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                      "total_tokens": prompt_tokens + len(text) // 4,
+                      "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+        }
@@ -4,8 +4,27 @@ st.set_page_config(page_title="Marginal·IA", page_icon="📖")
 
 from utils.db import get_supabase_client
 from utils.sidebar import render_sidebar
+from utils.metrics import start_metrics_server
+from utils.profiler import begin_run, end_run, render_profiler_panel
+from utils.warmup import start_warmup
 import time
 
+@st.cache_resource
+def _metrics_server():
+    """Starts the /metrics endpoint once per server process (if METRICS_PORT is set)."""
+    return start_metrics_server()
+
+@st.cache_resource
+def _warmup():
+    """Loads heavy dependencies in the background once per server process (if MARGINAL_WARMUP=1)."""
+    return start_warmup()
+
+_metrics_server()
+_warmup()
+
+# Records Supabase round-trips for this rerun when profiling is enabled
+begin_run()
+
 def should_refresh_session(session):
     """Check if the session should be refreshed based on token expiration."""
     if not session or not hasattr(session, 'expires_at'):
@@ -52,7 +71,10 @@ else:
 # Redirect to login if no valid user
 if not st.session_state.get("user"):
     pg = st.navigation([st.Page("pages/login.py", title="Login")])
-    pg.run()
+    try:
+        pg.run()
+    finally:
+        end_run(pg.title)
     st.stop()
 
 if "library" not in st.session_state:
@@ -71,4 +93,10 @@ third_page = st.Page("pages/notes.py", title="View all notes")
 
 pg = st.navigation([home_page, secondary_page, third_page])
 
-pg.run()
+try:
+    pg.run()
+finally:
+    # Also runs when the page calls st.rerun() or st.stop()
+    end_run(pg.title)
+
+render_profiler_panel()
@@ -1,7 +1,9 @@
 import streamlit as st
 from utils.db import get_authenticated_client
 from utils.sidebar import clear_books_cache
-from structures.book import Book
+from utils.decode import decode_books, decode_notes
+from utils.bulk import delete_books, merge_books
+from utils.summaries import get_book_digests, summarize_book, store_digest
 
 st.set_page_config(page_title="Manage Books")
 st.title("Manage Books")
@@ -26,6 +28,84 @@ def edit_book_dialog(book):
             except Exception as e:
                 st.error(f"Error: {e}")
 
+# --- BULK ACTIONS ---
+# The notes page's session copy is updated in place (notes_state is imported
+# on use, so this page does not load the note indexes)
+def clear_book_selection():
+    st.session_state.selected_book_ids = set()
+    for key in [k for k in st.session_state if str(k).startswith("select_book_")]:
+        del st.session_state[key]
+
+def toggle_book_selection(book_id):
+    """Callback: a book checkbox changed."""
+    if st.session_state[f"select_book_{book_id}"]:
+        st.session_state.selected_book_ids.add(book_id)
+    else:
+        st.session_state.selected_book_ids.discard(book_id)
+
+@st.dialog("Delete books")
+def bulk_delete_books_dialog(book_ids, note_count):
+    from utils.notes_state import remove_books
+
+    st.write(f"Delete {len(book_ids)} books and their {note_count} notes? This cannot be undone.")
+
+    if st.button("Delete", type="primary", use_container_width=True):
+        try:
+            # notes.book_id cascades: one request removes the books and their notes
+            delete_books(get_authenticated_client(), book_ids)
+            remove_books(book_ids)
+            clear_books_cache()
+            clear_book_selection()
+            st.rerun()
+        except Exception as e:
+            st.error(f"Delete failed: {e}")
+
+@st.dialog("Merge books")
+def merge_books_dialog(book_ids, library):
+    from utils.notes_state import move_book_notes, remove_books
+
+    targets = [b for b in library if b.id not in book_ids]
+    if not targets:
+        st.warning("Keep at least one book unselected to merge into")
+        return
+
+    target = st.selectbox("Move their notes to", targets, format_func=lambda b: b.title)
+    st.caption(f"The {len(book_ids)} selected books are deleted once their notes are moved.")
+
+    if st.button("Merge", type="primary", use_container_width=True):
+        try:
+            merge_books(get_authenticated_client(), book_ids, target.id)
+            move_book_notes(book_ids, target.id)
+            remove_books(book_ids)
+            clear_books_cache()
+            clear_book_selection()
+            st.rerun()
+        except Exception as e:
+            st.error(f"Merge failed: {e}")
+
+# --- DIGESTS ---
+def refresh_digest(book):
+    """Bring the book's summary up to date; only changed page ranges are summarized again."""
+    from utils.clients import get_groq_client
+
+    try:
+        with st.spinner(f"Summarizing {book.title}..."):
+            response = client.table("notes").select("*").eq("book_id", book.id).execute()
+            digest = summarize_book(client, get_groq_client(), user_id, book, decode_notes(response.data))
+        store_digest(book.id, digest)
+        st.rerun()
+    except Exception as e:
+        st.error(f"Summary failed: {e}")
+
+def show_digest(book, digest, count):
+    with st.expander("Summary"):
+        if digest.note_count != count:
+            st.caption(f"Written from {digest.note_count} notes; the book now has {count}.")
+        st.write(digest.summary)
+        if len(digest.chunks) > 1:
+            for chunk in digest.chunks:
+                st.caption(f"**{chunk.label}** ({chunk.note_count} notes): {chunk.summary}")
+
 user_id = st.session_state.user.id
 client = get_authenticated_client()
 
@@ -49,33 +129,67 @@ for note in all_notes:
     if bid:
         note_counts[bid] = note_counts.get(bid, 0) + 1
 
-library = []
-for b in books_data:
-    b_clean = b.copy()
-    if "user_id" in b_clean: del b_clean["user_id"]
-    if "created_at" in b_clean: del b_clean["created_at"]
-    
-    library.append(Book(**b_clean))
+library = decode_books(books_data)
+
+digests = get_book_digests(user_id)
 
 st.session_state.library = library
 
+# Selected book ids; drop books that no longer exist
+book_ids = {book.id for book in library}
+selected_ids = {book_id for book_id in st.session_state.get("selected_book_ids", ()) if book_id in book_ids}
+st.session_state.selected_book_ids = selected_ids
+
 if not library:
     st.info("No books yet.")
 else:
+    select_mode = st.toggle("Select", key="books_select_mode", help="Select books to delete or merge them")
+
+    if select_mode:
+        with st.container(border=True):
+            s1, s2, s3, s4, s5 = st.columns([3, 2, 2, 2, 2])
+            with s2:
+                if st.button("All", use_container_width=True):
+                    selected_ids.update(book_ids)
+            with s3:
+                if st.button("None", disabled=not selected_ids, use_container_width=True):
+                    clear_book_selection()
+                    selected_ids = st.session_state.selected_book_ids
+            with s1:
+                st.write(f"**{len(selected_ids)}** selected")
+            with s4:
+                if st.button("Merge", disabled=not selected_ids, use_container_width=True):
+                    merge_books_dialog(list(selected_ids), library)
+            with s5:
+                if st.button("🗑️ Delete", disabled=not selected_ids, use_container_width=True):
+                    bulk_delete_books_dialog(list(selected_ids), sum(note_counts.get(b, 0) for b in selected_ids))
+
     for book in library:
         with st.container(border=True):
             c1, c2, c3 = st.columns([5, 2, 2])
             
             with c1:
+                if select_mode:
+                    key = f"select_book_{book.id}"
+                    st.session_state[key] = book.id in selected_ids
+                    st.checkbox("Select", key=key, on_change=toggle_book_selection, args=(book.id,),
+                                label_visibility="collapsed")
                 if st.button(f"📖 {book.title}", key=f"nav_{book.id}", help="Click to view notes"):
                     st.session_state.active_book_title = book.title
                     st.switch_page("pages/notes.py")
                 
                 st.caption(f"By {book.author}")
+
+                count = note_counts.get(book.id, 0)
+                digest = digests.get(book.id)
+                if digest:
+                    show_digest(book, digest, count)
             
             with c2:
-                count = note_counts.get(book.id, 0)
                 st.write(f"{count} notes")
+                if count and st.button("Update summary" if digest else "Summarize", key=f"digest_{book.id}",
+                                       help="Summarize the book from its notes"):
+                    refresh_digest(book)
 
             with c3:
                 col_edit, col_del = st.columns(2)
@@ -85,9 +199,12 @@ else:
                 
                 with col_del:
                     if st.button("🗑️", key=f"del_{book.id}", help="Delete book"):
+                        from utils.notes_state import remove_books
+
                         try:
-                            client.table("notes").delete().eq("book_id", book.id).execute()
-                            client.table("books").delete().eq("id", book.id).execute()
+                            # notes.book_id cascades to the book's notes
+                            delete_books(client, [book.id])
+                            remove_books([book.id])
                             clear_books_cache()
                             st.rerun()
                         except Exception as e:
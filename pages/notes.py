@@ -1,10 +1,25 @@
 import streamlit as st
+import pandas as pd
+from dataclasses import replace
 from utils.db import get_authenticated_client
-from structures.note import Note
-from utils.export import generate_obsidian_export, generate_csv_export
+from utils.sidebar import clear_books_cache
+from utils.clients import get_groq_client
+from utils.importer import parse_import_file, resolve_books, import_notes
+from utils.notes_state import (
+    load_notes, mark_notes_stale, update_note, update_notes, remove_notes, related_notes
+)
+from utils.bulk import delete_notes, move_notes, edit_tags, normalize_tags
+from utils.summaries import get_book_digests
+from utils.export import (
+    iter_obsidian_export, iter_csv_export, iter_jsonl_export, iter_parquet_export,
+    generate_incremental_export
+)
 
 st.set_page_config(page_title="Manage Notes")
 
+# Number of notes rendered as cards per page
+PAGE_SIZES = [20, 50, 100]
+
 # --- EDIT DIALOG ---
 @st.dialog("Edit Note")
 def edit_note_dialog(note):
@@ -25,23 +40,158 @@ def edit_note_dialog(note):
                     "content": new_content
                 }
                 client.table("notes").update(updates).eq("id", note.id).execute()
+                update_note(replace(note, **updates))
                 st.success("Note updated!")
                 st.rerun()
             except Exception as e:
                 st.error(f"Update failed: {e}")
 
+# --- RELATED NOTES DIALOG ---
+@st.dialog("Related notes")
+def related_notes_dialog(note):
+    other_books_only = st.checkbox("Other books only", value=False)
+
+    with st.spinner("Finding related notes..."):
+        related = related_notes(note.id, k=5, other_books_only=other_books_only)
+
+    if not related:
+        st.info("No related notes found")
+        return
+
+    note_table = st.session_state.notes
+    book_titles = {b.id: b.title for b in st.session_state.get("library", [])}
+
+    for related_id, score in related:
+        row = note_table.row_of(related_id)
+        if row is None:
+            continue
+        other = note_table.note(row)
+        with st.container(border=True):
+            page = f" · Page {other.page_number}" if other.page_number else ""
+            st.caption(f"📖 {book_titles.get(other.book_id, 'Unknown Book')}{page} · {int(score * 100)}% similar")
+            if other.quote:
+                st.markdown(f"> *\"{other.quote}\"*")
+            if other.comment:
+                st.write(other.comment)
+            elif not other.quote and other.content:
+                st.write(other.content)
+
+# --- SELECTION ---
+def clear_selection():
+    st.session_state.selected_note_ids = set()
+    for key in [k for k in st.session_state if str(k).startswith("select_note_")]:
+        del st.session_state[key]
+    st.session_state.pop("notes_table", None)
+
+def toggle_note_selection(note_id):
+    """Callback: a card checkbox changed."""
+    if st.session_state[f"select_note_{note_id}"]:
+        st.session_state.selected_note_ids.add(note_id)
+    else:
+        st.session_state.selected_note_ids.discard(note_id)
+
+def sync_table_selection():
+    """Callback: the table selection changed; rows are positions in the last rendered table."""
+    table_ids = st.session_state.get("notes_table_ids", [])
+    rows = st.session_state.notes_table.selection.rows
+    st.session_state.selected_note_ids = {table_ids[row] for row in rows if row < len(table_ids)}
+
+# --- BULK ACTION DIALOGS ---
+# Each action is a single batched request (see utils.bulk); the session's
+# notes are updated in place, so no refetch is needed afterwards.
+@st.dialog("Delete notes")
+def bulk_delete_dialog(note_ids):
+    st.write(f"Delete {len(note_ids)} notes? This cannot be undone.")
+
+    if st.button("Delete", type="primary", use_container_width=True):
+        try:
+            delete_notes(get_authenticated_client(), note_ids)
+            remove_notes(note_ids)
+            clear_selection()
+            st.rerun()
+        except Exception as e:
+            # Part of a very large selection may already be deleted
+            mark_notes_stale()
+            st.error(f"Delete failed: {e}")
+
+@st.dialog("Edit tags")
+def bulk_tags_dialog(note_ids):
+    note_table = st.session_state.notes
+    notes = note_table.notes(note_table.rows_of(note_ids))
+    present_tags = sorted({tag for note in notes for tag in note.tags or []})
+
+    added = st.text_input("Add tags", placeholder="idea, to-read", help="Separate tags with commas")
+    removed = st.multiselect("Remove tags", present_tags, format_func=lambda t: f"#{t}")
+
+    if st.button(f"Apply to {len(note_ids)} notes", type="primary", use_container_width=True):
+        added = normalize_tags(added.split(","))
+        removed = [t for t in removed if t not in added]
+        if not added and not removed:
+            st.warning("Nothing to change")
+            return
+        try:
+            new_tags = edit_tags(get_authenticated_client(), note_ids, added, removed)
+            update_notes([replace(note, tags=new_tags[note.id]) for note in notes if note.id in new_tags])
+            clear_selection()
+            st.rerun()
+        except Exception as e:
+            st.error(f"Tag update failed: {e}")
+
+@st.dialog("Move notes")
+def bulk_move_dialog(note_ids):
+    library = st.session_state.get("library", [])
+    if not library:
+        st.warning("No books to move notes to")
+        return
+
+    target = st.selectbox("Move to", library, format_func=lambda b: b.title)
+
+    if st.button(f"Move {len(note_ids)} notes", type="primary", use_container_width=True):
+        try:
+            move_notes(get_authenticated_client(), note_ids, target.id)
+            note_table = st.session_state.notes
+            update_notes([replace(note, book_id=target.id) for note in note_table.notes(note_table.rows_of(note_ids))])
+            clear_selection()
+            st.rerun()
+        except Exception as e:
+            mark_notes_stale()
+            st.error(f"Move failed: {e}")
+
+# --- INCREMENTAL EXPORT MANIFEST ---
+def load_export_manifest(user_id):
+    """Returns the manifest of the user's last incremental export, or {} if none."""
+    try:
+        client = get_authenticated_client()
+        response = client.table("export_manifests").select("manifest").eq("user_id", user_id).execute()
+        if response.data:
+            return response.data[0]["manifest"] or {}
+    except Exception as e:
+        st.warning(f"Could not load previous export state: {e}")
+    return {}
+
+def save_export_manifest(user_id, manifest):
+    """Callback: stores the manifest once the incremental export is downloaded."""
+    try:
+        client = get_authenticated_client()
+        client.table("export_manifests").upsert({
+            "user_id": user_id,
+            "manifest": manifest
+        }).execute()
+    except Exception as e:
+        st.error(f"Could not save export state: {e}")
+
 # --- EXPORT DIALOG ---
 @st.dialog("Export to Obsidian")
 def export_dialog():
-    all_notes = st.session_state.notes
+    note_table = st.session_state.notes
     library = st.session_state.get("library", [])
 
-    if not all_notes:
+    if not note_table:
         st.warning("No notes to export")
         return
 
     # Build book options: only books that have notes
-    books_with_notes = set(n.book_id for n in all_notes if n.book_id)
+    books_with_notes = note_table.present_book_ids()
     available_books = [b for b in library if b.id in books_with_notes]
 
     # Create options list
@@ -51,12 +201,12 @@ def export_dialog():
 
     # Determine notes to export
     if selected == "All books":
-        notes_to_export = all_notes
+        notes_to_export = note_table.notes()
         filename = "marginal-ia-export.zip"
     else:
         selected_book = next((b for b in available_books if b.title == selected), None)
         if selected_book:
-            notes_to_export = [n for n in all_notes if n.book_id == selected_book.id]
+            notes_to_export = note_table.notes(note_table.book_rows(selected_book.id))
             filename = f"{selected_book.title}.zip"
         else:
             notes_to_export = []
@@ -69,14 +219,43 @@ def export_dialog():
         st.divider()
 
         # Format selection
+        format_options = ["Obsidian (Markdown)", "CSV (Notion, Excel)", "JSON Lines", "Parquet"]
+        if selected == "All books":
+            # Incremental sync only makes sense against the whole vault
+            format_options.insert(1, "Obsidian (changes only)")
+
         export_format = st.radio(
             "Format",
-            ["Obsidian (Markdown)", "CSV (Notion, Excel)"],
+            format_options,
             horizontal=True
         )
 
-        if export_format == "Obsidian (Markdown)":
-            zip_data = generate_obsidian_export(library, notes_to_export)
+        # st.download_button keeps the whole file in memory whatever it is
+        # given, so the streamed chunks are simply joined into bytes
+        if export_format == "Obsidian (changes only)":
+            user_id = st.session_state.user.id
+            export = generate_incremental_export(
+                library, notes_to_export, load_export_manifest(user_id),
+                digests=get_book_digests(user_id)
+            )
+
+            st.caption(f"{len(export.changed)} changed files, {len(export.deleted)} deleted files")
+            if export.deleted:
+                with st.expander("Files to delete from your vault"):
+                    st.code("\n".join(export.deleted), language=None)
+
+            st.download_button(
+                label=" Download ZIP",
+                data=export.data,
+                file_name=filename.replace(".zip", "-changes.zip"),
+                mime="application/zip",
+                use_container_width=True,
+                on_click=save_export_manifest,
+                args=(user_id, export.manifest)
+            )
+        elif export_format == "Obsidian (Markdown)":
+            digests = get_book_digests(st.session_state.user.id)
+            zip_data = b"".join(iter_obsidian_export(library, notes_to_export, digests=digests))
             st.download_button(
                 label=" Download ZIP",
                 data=zip_data,
@@ -84,8 +263,26 @@ def export_dialog():
                 mime="application/zip",
                 use_container_width=True
             )
+        elif export_format == "JSON Lines":
+            jsonl_data = b"".join(iter_jsonl_export(library, notes_to_export))
+            st.download_button(
+                label=" Download JSON Lines",
+                data=jsonl_data,
+                file_name=filename.replace(".zip", ".jsonl"),
+                mime="application/x-ndjson",
+                use_container_width=True
+            )
+        elif export_format == "Parquet":
+            parquet_data = b"".join(iter_parquet_export(library, notes_to_export))
+            st.download_button(
+                label=" Download Parquet",
+                data=parquet_data,
+                file_name=filename.replace(".zip", ".parquet"),
+                mime="application/vnd.apache.parquet",
+                use_container_width=True
+            )
         else:
-            csv_data = generate_csv_export(library, notes_to_export)
+            csv_data = b"".join(iter_csv_export(library, notes_to_export))
             csv_filename = filename.replace(".zip", ".csv")
             st.download_button(
                 label=" Download CSV",
@@ -95,27 +292,112 @@ def export_dialog():
                 use_container_width=True
             )
 
+# --- IMPORT DIALOG ---
+@st.dialog("Import notes")
+def import_dialog():
+    uploaded = st.file_uploader(
+        "CSV export, Obsidian book file or Obsidian export ZIP",
+        type=["csv", "md", "zip"]
+    )
+    retag = st.checkbox("Re-tag notes with AI", help="Replaces the imported tags")
+
+    if not uploaded:
+        return
+
+    try:
+        records = parse_import_file(uploaded.name, uploaded.getvalue())
+    except Exception as e:
+        st.error(f"Could not read file: {e}")
+        return
+
+    st.caption(f"{len(records)} notes found")
+    st.caption("Importing the same file again skips notes that were already imported.")
+
+    if records and st.button("Import", use_container_width=True):
+        user_id = st.session_state.user.id
+        progress_bar = st.progress(0.0, text="Importing...")
+
+        try:
+            client = get_authenticated_client()
+            book_ids = resolve_books(client, user_id, records)
+            clear_books_cache()
+
+            import_notes(
+                client,
+                user_id,
+                records,
+                book_ids,
+                retag_client=get_groq_client() if retag else None,
+                progress=lambda done, total: progress_bar.progress(done / total, text=f"Imported {done}/{total} notes")
+            )
+            mark_notes_stale()
+            st.success("Import complete!")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+
 # --- MAIN APP ---
-col_title, col_export = st.columns([8, 2])
+col_title, col_import, col_export = st.columns([6, 2, 2])
 with col_title:
     st.title("My Notes")
 
 user_id = st.session_state.user.id
 client = get_authenticated_client()
 
-try:
-    response = client.table("notes").select("*").eq("user_id", user_id).execute()
-    notes = [Note(**{k: v for k, v in n.items() if k not in ["user_id", "created_at"]}) for n in response.data]
-    st.session_state.notes = notes
-except Exception as e:
-    st.error(f"Error fetching notes: {e}")
-    st.session_state.notes = []
-filtered_notes = st.session_state.notes
-if st.session_state.current_book_obj:
-    filtered_notes = [n for n in st.session_state.notes if n.book_id == st.session_state.current_book_obj.id]
-    if not filtered_notes:
+note_table, note_index = load_notes(user_id)
+current_book_id = st.session_state.current_book_obj.id if st.session_state.current_book_obj else None
+
+# --- FILTERS ---
+with st.expander("Filters"):
+    tag_counts = note_index.tag_counts()
+    selected_tags = st.multiselect(
+        "Tags",
+        list(tag_counts),
+        format_func=lambda t: f"#{t} ({tag_counts[t]})",
+        key="filter_tags"
+    )
+    match_all_tags = st.checkbox("Notes must have all selected tags", key="filter_all_tags")
+
+    fp1, fp2 = st.columns(2)
+    with fp1:
+        page_min = st.number_input("From page", min_value=0, value=0, key="filter_page_min")
+    with fp2:
+        page_max = st.number_input("To page", min_value=0, value=0, key="filter_page_max", help="0 for no limit")
+
+    low_confidence = st.checkbox("Only low-confidence parses", key="filter_low_confidence")
+    confidence_max = st.slider("Maximum confidence", 0.0, 1.0, 0.8, 0.05, key="filter_confidence_max",
+                               disabled=not low_confidence)
+
+    if st.button("Reload notes", help="Fetch notes again, e.g. after editing on another device"):
+        mark_notes_stale()
+        st.rerun()
+
+filters_active = bool(selected_tags) or page_min > 0 or page_max > 0 or low_confidence
+if filters_active or current_book_id:
+    matching_ids = note_index.query(
+        book_id=current_book_id,
+        tags=selected_tags or None,
+        match_all_tags=match_all_tags,
+        page_min=page_min or None,
+        page_max=page_max or None,
+        confidence_max=confidence_max if low_confidence else None
+    )
+    filtered_rows = note_table.rows_of(matching_ids)
+else:
+    filtered_rows = note_table.all_rows()
+
+if not len(filtered_rows):
+    if filters_active:
+        st.info("No notes match these filters")
+    elif current_book_id:
         st.info(f"No notes found for '{st.session_state.current_book_obj.title}'")
 
+# --- IMPORT BUTTON (in header) ---
+with col_import:
+    st.write("")  # Spacing to align with title
+    if st.button(" Import", help="Import notes from CSV or Obsidian"):
+        import_dialog()
+
 # --- EXPORT BUTTON (in header) ---
 with col_export:
     st.write("")  # Spacing to align with title
@@ -123,17 +405,19 @@ with col_export:
         if st.button(" Export", help="Export notes to Obsidian"):
             export_dialog()
 
-# --- DISPLAY LOOP ---
-for note in reversed(filtered_notes):
-    
-    # Get book title for the header (in case we are viewing "All Notes")
-    book_title = next((b.title for b in st.session_state.library if b.id == note.book_id), "Unknown Book")
-
+# --- DISPLAY ---
+def render_note_card(note, book_title, selectable=False):
     with st.container(border=True):
         # --- Header ---
         c1, c2 = st.columns([8, 1])
         with c1: 
-            st.caption(f"📖 {book_title}")
+            if selectable:
+                key = f"select_note_{note.id}"
+                # The selection set is the source of truth (select all, clear)
+                st.session_state[key] = note.id in st.session_state.selected_note_ids
+                st.checkbox(f"📖 {book_title}", key=key, on_change=toggle_note_selection, args=(note.id,))
+            else:
+                st.caption(f"📖 {book_title}")
         with c2: 
             if note.page_number: st.caption(f"Page {note.page_number}")
         
@@ -150,7 +434,7 @@ for note in reversed(filtered_notes):
             st.caption(" • ".join([f"#{t}" for t in note.tags]))
 
         # --- Footer (Confidence | Actions) ---
-        f1, f2 = st.columns([8, 2])
+        f1, f2 = st.columns([7, 3])
         
         with f1:
             score = getattr(note, "confidence_score", 1.0) or 1.0
@@ -158,7 +442,11 @@ for note in reversed(filtered_notes):
             st.markdown(f"<span style='color:{color};'>●</span> Confidence: {int(score*100)}%", unsafe_allow_html=True)
         
         with f2:
-            b_edit, b_del = st.columns(2)
+            b_rel, b_edit, b_del = st.columns(3)
+
+            with b_rel:
+                if st.button("🔗", key=f"related_note_{note.id}", help="Related notes"):
+                    related_notes_dialog(note)
             
             with b_edit:
                 if st.button("Edit", key=f"edit_note_{note.id}", help="Edit Note"):
@@ -168,6 +456,86 @@ for note in reversed(filtered_notes):
                 if st.button("🗑️", key=f"del_note_{note.id}", help="Delete Note"):
                     try:
                         client.table("notes").delete().eq("id", note.id).execute()
+                        remove_notes([note.id])
                         st.rerun()
                     except Exception as e:
-                        st.error(f"Delete failed: {e}")
\ No newline at end of file
+                        st.error(f"Delete failed: {e}")
+
+# Newest first, like the recording order
+display_rows = filtered_rows[::-1]
+book_titles = {b.id: b.title for b in st.session_state.library}
+
+# Selected note ids, kept across pages, views and filters; drop deleted notes
+selected_ids = {note_id for note_id in st.session_state.get("selected_note_ids", ()) if note_id in note_table}
+st.session_state.selected_note_ids = selected_ids
+
+if len(display_rows):
+    v1, v2, v3 = st.columns([4, 2, 2])
+    with v1:
+        view_mode = st.radio("View", ["Cards", "Table"], horizontal=True, label_visibility="collapsed")
+    with v2:
+        select_mode = st.toggle("Select", key="notes_select_mode", help="Select notes to delete, tag or move them")
+    with v3:
+        page_size = st.selectbox("Notes per page", PAGE_SIZES, key="notes_page_size", label_visibility="collapsed",
+                                 format_func=lambda n: f"{n} per page")
+
+    # --- BULK ACTIONS ---
+    if select_mode:
+        with st.container(border=True):
+            s1, s2, s3, s4, s5, s6 = st.columns([3, 2, 2, 2, 2, 2])
+            with s2:
+                if st.button("All", help=f"Select the {len(display_rows)} notes shown", use_container_width=True):
+                    selected_ids.update(note_table.ids[row] for row in display_rows)
+                    st.session_state.pop("notes_table", None)
+            with s3:
+                if st.button("None", help="Clear the selection", disabled=not selected_ids, use_container_width=True):
+                    clear_selection()
+                    selected_ids = st.session_state.selected_note_ids
+            with s1:
+                st.write(f"**{len(selected_ids)}** selected")
+            with s4:
+                if st.button("🏷️ Tags", disabled=not selected_ids, use_container_width=True):
+                    bulk_tags_dialog(list(selected_ids))
+            with s5:
+                if st.button("📖 Move", disabled=not selected_ids, use_container_width=True):
+                    bulk_move_dialog(list(selected_ids))
+            with s6:
+                if st.button("🗑️ Delete", disabled=not selected_ids, use_container_width=True):
+                    bulk_delete_dialog(list(selected_ids))
+
+    if view_mode == "Table":
+        # One element for the whole selection; no per-note widgets
+        columns = note_table.columns(display_rows)
+        columns["book"] = [book_titles.get(bid, "Unknown Book") for bid in columns.pop("book_id")]
+        st.session_state.notes_table_ids = columns["id"]
+        selection = {"on_select": sync_table_selection, "selection_mode": "multi-row"} if select_mode else {}
+        st.dataframe(
+            pd.DataFrame(columns).set_index("id"),
+            column_order=["book", "page_number", "quote", "comment", "tags", "confidence_score"],
+            column_config={
+                "page_number": st.column_config.NumberColumn("Page", format="%d"),
+                "confidence_score": st.column_config.ProgressColumn("Confidence", min_value=0.0, max_value=1.0),
+            },
+            use_container_width=True,
+            key="notes_table",
+            **selection,
+        )
+    else:
+        # Only the visible window gets Note objects and widgets
+        page_count = (len(display_rows) - 1) // page_size + 1
+        if st.session_state.get("notes_page", 1) > page_count:
+            # The selection shrank (other book, deleted notes): clamp to the last page
+            st.session_state.notes_page = page_count
+        page = st.session_state.get("notes_page", 1)
+
+        start = (page - 1) * page_size
+        for note in note_table.notes(display_rows[start:start + page_size]):
+            render_note_card(note, book_titles.get(note.book_id, "Unknown Book"), selectable=select_mode)
+
+        if page_count > 1:
+            p1, p2 = st.columns([6, 2])
+            with p1:
+                st.caption(f"Notes {start + 1}–{min(start + page_size, len(display_rows))} of {len(display_rows)}")
+            with p2:
+                st.number_input("Page", min_value=1, max_value=page_count, key="notes_page",
+                                label_visibility="collapsed")
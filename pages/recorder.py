@@ -1,43 +1,31 @@
 import streamlit as st
 from dataclasses import asdict
-from openai import OpenAI
-from audiorecorder import audiorecorder
 import io
-import os
-from structures.note import Note
+import time
+from structures.note import Note, parse_confidence, parse_page_number
 from utils.parser import parse_note_content
 from utils.db import get_authenticated_client
+from utils.clients import get_groq_client
+from utils.metrics import timed, provider_of, STAGE_SECONDS, AUDIO_SECONDS, AUDIO_BYTES
 
 current_book = st.session_state.get("current_book_obj", None)
 
+TRANSCRIBE_MODEL = "whisper-large-v3-turbo"
+
+
+def save_note(new_note):
+    """Inserts the note and records it in the session's note state."""
+    from utils.notes_state import add_note
+
+    note_dict = asdict(new_note)
+    note_dict["user_id"] = st.session_state.user.id
+
+    with timed("insert"):
+        supabase_client = get_authenticated_client()
+        supabase_client.table("notes").insert(note_dict).execute()
+
+    add_note(new_note)
 
-@st.cache_resource
-def get_openai_client():
-    """Returns cached OpenAI client instance."""
-    try:
-        api_key = st.secrets.get("OpenAI_key")
-    except (FileNotFoundError, AttributeError):
-        api_key = None
-
-    api_key = api_key or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("Missing OpenAI API key configuration")
-    return OpenAI(api_key=api_key)
-
-@st.cache_resource
-def get_groq_client():
-    try:
-        api_key = st.secrets.get("GROQ_API_KEY")
-    except (FileNotFoundError, AttributeError):
-        api_key = None
-
-    api_key = api_key or os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("Missing Groq API key configuration")
-    return OpenAI(
-        api_key=api_key,
-        base_url="https://api.groq.com/openai/v1"
-    )
 
 st.title("Marginal·IA")
 st.caption("Seamless Voice-to-Note")
@@ -46,29 +34,63 @@ st.divider()
 
 current_book = st.session_state.get("current_book_obj", None)
 
+# --- Likely duplicate awaiting a decision ---
+pending = st.session_state.get("pending_duplicate")
+if pending:
+    new_note, similarity = pending
+    with st.container(border=True):
+        st.warning(f"This looks like a note you already saved for this book ({int(similarity * 100)}% similar).")
+        st.caption(new_note.comment or new_note.quote or new_note.content)
+        d1, d2 = st.columns(2)
+        with d1:
+            if st.button("Save anyway", use_container_width=True):
+                try:
+                    save_note(new_note)
+                    del st.session_state.pending_duplicate
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {e}")
+        with d2:
+            if st.button("Discard", use_container_width=True):
+                del st.session_state.pending_duplicate
+                st.rerun()
+
+# Imports pydub: only loaded once a page with the recorder runs
+from audiorecorder import audiorecorder
+
 audio = audiorecorder("🎙️ Start recording", "⏹️ Stop recording", key=f"recorder_{st.session_state.recorder_key}")
 st.caption("Page # · Quote · Tags · Comment")
 
 if len(audio) > 0:
-    audio_data = audio
+    # Note state (NumPy indexes) is only needed once there is something to save
+    from utils.notes_state import get_duplicate_index
+    from utils.dedup import note_text
 
     with st.container():
         st.write("")
 
         with st.status("Transcribing...", expanded=True) as status:
             try:
+                pipeline_start = time.perf_counter()
+
                 # Initialize clients only when needed
                 groq_client = get_groq_client()
+                provider = provider_of(groq_client)
 
-                audio_buffer = io.BytesIO()
-                audio_data.export(audio_buffer, format="wav")
-                audio_buffer.name = "audio.wav"
+                audio_data = audio
+                with timed("wav_export"):
+                    audio_buffer = io.BytesIO()
+                    audio_data.export(audio_buffer, format="wav")
+                    audio_buffer.name = "audio.wav"
+                AUDIO_SECONDS.observe(audio_data.duration_seconds)
+                AUDIO_BYTES.observe(audio_buffer.getbuffer().nbytes)
 
                 # Auto-detect language (supports mixed languages)
-                transcript = groq_client.audio.transcriptions.create(
-                    model="whisper-large-v3-turbo",
-                    file=audio_buffer,
-                )
+                with timed("transcribe", provider=provider, model=TRANSCRIBE_MODEL):
+                    transcript = groq_client.audio.transcriptions.create(
+                        model=TRANSCRIBE_MODEL,
+                        file=audio_buffer,
+                    )
 
                 status.update(label="Parsing structure...", state="running")
                 parsed_data = parse_note_content(transcript.text, groq_client)
@@ -77,22 +99,26 @@ if len(audio) > 0:
                     status.update(label="Parsing failed", state="error", expanded=True)
                     st.error("Failed to parse the note structure. Please try again.")
                 else:
+                    # The page and confidence columns are numeric: "45" or "0.9" would fail later
+                    parsed_data["page_number"] = parse_page_number(parsed_data.get("page_number"))
+                    parsed_data["confidence_score"] = parse_confidence(parsed_data.get("confidence_score"))
                     if current_book:
                         new_note = Note(content=transcript.text, book_id=current_book.id, **parsed_data)
                     else:
                         new_note = Note(content=transcript.text, **parsed_data)
 
-                    note_dict = asdict(new_note)
-                    note_dict["user_id"] = st.session_state.user.id
-
-                    supabase_client = get_authenticated_client()
-                    supabase_client.table("notes").insert(note_dict).execute()
+                    # Catch re-recordings after a failed or slow save before inserting
+                    duplicate_index = get_duplicate_index(st.session_state.user.id, new_note.book_id)
+                    duplicate = duplicate_index.find(note_text(new_note))
 
-                    if "notes" not in st.session_state:
-                        st.session_state.notes = []
-                    st.session_state.notes.append(new_note)
+                    if duplicate:
+                        st.session_state.pending_duplicate = (new_note, duplicate[1])
+                        status.update(label="Possible duplicate", state="error", expanded=False)
+                    else:
+                        save_note(new_note)
+                        status.update(label="Saved!", state="complete", expanded=False)
 
-                    status.update(label="Saved!", state="complete", expanded=False)
+                    STAGE_SECONDS.observe(time.perf_counter() - pipeline_start, stage="total")
                     st.session_state.recorder_key += 1
                     st.rerun()
 
@@ -0,0 +1,14 @@
+from dataclasses import dataclass, field
+
+@dataclass
+class ChunkSummary:
+    label: str          # e.g. "Pages 1–50" or "Notes without a page"
+    note_count: int
+    summary: str
+
+@dataclass
+class BookDigest:
+    book_id: str
+    summary: str
+    note_count: int
+    chunks: list[ChunkSummary] = field(default_factory=list)
@@ -1,9 +1,10 @@
+import math
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 import uuid
 
-@dataclass
+@dataclass(slots=True)
 class Note:
     content: str
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -12,4 +13,30 @@ class Note:
     comment: Optional[str] = None 
     book_id: Optional[str] = None
     tags: Optional[list[str]] = None
-    confidence_score: Optional[float] = None
\ No newline at end of file
+    confidence_score: Optional[float] = None
+
+
+# Range of the integer page_number column
+PAGE_MIN, PAGE_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def parse_page_number(value) -> Optional[int]:
+    """The page as an int, or None if it is not one (LLMs sometimes answer "45" or 45.0)."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        page = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return page if PAGE_MIN <= page <= PAGE_MAX else None
+
+
+def parse_confidence(value) -> Optional[float]:
+    """The confidence as a float, or None if it is not a finite number (LLMs sometimes answer "0.9")."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return confidence if math.isfinite(confidence) else None
@@ -0,0 +1,219 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from structures.note import Note, parse_confidence, parse_page_number
+
+
+def _slots_to_bits(slots: np.ndarray, capacity: int) -> int:
+    """Pack slot numbers into a Python int bitset (bit i set = slot i)."""
+    mask = np.zeros(capacity, dtype=bool)
+    mask[slots] = True
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def _bits_to_slots(bits: int, capacity: int) -> np.ndarray:
+    """Unpack a bitset into sorted slot numbers."""
+    nbytes = (capacity + 7) // 8
+    packed = np.frombuffer(bits.to_bytes(nbytes, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder="little")[:capacity])
+
+
+class _SortedColumn:
+    """Values kept sorted alongside the slot they belong to, for range queries."""
+
+    __slots__ = ("values", "slots")
+
+    def __init__(self, values: np.ndarray, slots: np.ndarray):
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.slots = slots[order]
+
+    def insert(self, value, slot: int):
+        i = int(np.searchsorted(self.values, value, side="right"))
+        self.values = np.insert(self.values, i, value)
+        self.slots = np.insert(self.slots, i, slot)
+
+    def remove(self, value, slot: int):
+        lo = int(np.searchsorted(self.values, value, side="left"))
+        hi = int(np.searchsorted(self.values, value, side="right"))
+        i = lo + int(np.flatnonzero(self.slots[lo:hi] == slot)[0])
+        self.values = np.delete(self.values, i)
+        self.slots = np.delete(self.slots, i)
+
+    def range(self, low=None, high=None) -> np.ndarray:
+        """Slots whose value lies in [low, high]."""
+        lo = 0 if low is None else int(np.searchsorted(self.values, low, side="left"))
+        hi = len(self.values) if high is None else int(np.searchsorted(self.values, high, side="right"))
+        return self.slots[lo:hi]
+
+
+class NoteIndex:
+    """
+    Inverted index over a user's notes for tag, book, page and confidence filters.
+
+    Each note gets a slot; tags and books map to bitsets of slots (Python
+    ints), while page numbers and confidence scores are kept in sorted
+    arrays. Combined filters are bitset intersections, so no query scans
+    every note. add/update/remove keep the index current without a rebuild.
+    """
+
+    __slots__ = (
+        "_ids", "_slot_by_id", "_free", "_keys",
+        "_tags", "_books", "_pages", "_confidence", "_live",
+    )
+
+    def __init__(self, notes: Iterable[Note] = ()):
+        notes = list(notes)
+        self._ids: list[Optional[str]] = [n.id for n in notes]
+        self._slot_by_id = {note_id: slot for slot, note_id in enumerate(self._ids)}
+        self._free: list[int] = []
+        self._keys: dict[int, tuple] = {}
+
+        tag_slots: dict[str, list[int]] = {}
+        book_slots: dict[str, list[int]] = {}
+        page_values, page_slots = [], []
+        confidence_values, confidence_slots = [], []
+
+        for slot, note in enumerate(notes):
+            tags, book_id, page, confidence = self._keys[slot] = self._key(note)
+            for tag in tags:
+                tag_slots.setdefault(tag, []).append(slot)
+            if book_id:
+                book_slots.setdefault(book_id, []).append(slot)
+            if page is not None:
+                page_values.append(page)
+                page_slots.append(slot)
+            if confidence is not None:
+                confidence_values.append(confidence)
+                confidence_slots.append(slot)
+
+        capacity = len(self._ids)
+        self._tags = {t: _slots_to_bits(np.array(s), capacity) for t, s in tag_slots.items()}
+        self._books = {b: _slots_to_bits(np.array(s), capacity) for b, s in book_slots.items()}
+        self._pages = _SortedColumn(np.array(page_values, dtype=np.int32), np.array(page_slots, dtype=np.int64))
+        self._confidence = _SortedColumn(
+            np.array(confidence_values, dtype=np.float64), np.array(confidence_slots, dtype=np.int64)
+        )
+        self._live = (1 << capacity) - 1
+
+    @staticmethod
+    def _key(note: Note) -> tuple:
+        return (
+            tuple(set(note.tags or ())),
+            note.book_id,
+            parse_page_number(note.page_number),
+            parse_confidence(note.confidence_score),
+        )
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._slot_by_id
+
+    # --- Incremental maintenance ---
+
+    def add(self, note: Note):
+        if note.id in self._slot_by_id:
+            self.update(note)
+            return
+
+        key = self._key(note)
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = note.id
+        else:
+            slot = len(self._ids)
+            self._ids.append(note.id)
+        self._slot_by_id[note.id] = slot
+
+        tags, book_id, page, confidence = self._keys[slot] = key
+        bit = 1 << slot
+        for tag in tags:
+            self._tags[tag] = self._tags.get(tag, 0) | bit
+        if book_id:
+            self._books[book_id] = self._books.get(book_id, 0) | bit
+        if page is not None:
+            self._pages.insert(page, slot)
+        if confidence is not None:
+            self._confidence.insert(confidence, slot)
+        self._live |= bit
+
+    def remove(self, note_id: str):
+        slot = self._slot_by_id.pop(note_id, None)
+        if slot is None:
+            return
+
+        tags, book_id, page, confidence = self._keys.pop(slot)
+        bit = 1 << slot
+        for tag in tags:
+            self._tags[tag] &= ~bit
+            if not self._tags[tag]:
+                del self._tags[tag]
+        if book_id:
+            self._books[book_id] &= ~bit
+            if not self._books[book_id]:
+                del self._books[book_id]
+        if page is not None:
+            self._pages.remove(page, slot)
+        if confidence is not None:
+            self._confidence.remove(confidence, slot)
+        self._live &= ~bit
+
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    def update(self, note: Note):
+        self.remove(note.id)
+        self.add(note)
+
+    # --- Queries ---
+
+    def tag_counts(self) -> dict[str, int]:
+        """Number of notes per tag, most used first."""
+        counts = {tag: bits.bit_count() for tag, bits in self._tags.items()}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def query(
+        self,
+        book_id: Optional[str] = None,
+        tags: Optional[Iterable[str]] = None,
+        match_all_tags: bool = False,
+        page_min: Optional[int] = None,
+        page_max: Optional[int] = None,
+        confidence_max: Optional[float] = None,
+    ) -> set[str]:
+        """
+        Return the ids of the notes matching every given criterion.
+
+        tags matches notes carrying any of them, or all of them with
+        match_all_tags. Page and confidence bounds are inclusive and exclude
+        notes without a value.
+        """
+        capacity = len(self._ids)
+        bits = self._live
+
+        if book_id is not None:
+            bits &= self._books.get(book_id, 0)
+
+        if tags is not None:
+            tags = list(tags)
+            if match_all_tags:
+                for tag in tags:
+                    bits &= self._tags.get(tag, 0)
+            else:
+                any_tag = 0
+                for tag in tags:
+                    any_tag |= self._tags.get(tag, 0)
+                bits &= any_tag
+
+        if bits and (page_min is not None or page_max is not None):
+            bits &= _slots_to_bits(self._pages.range(page_min, page_max), capacity)
+
+        if bits and confidence_max is not None:
+            bits &= _slots_to_bits(self._confidence.range(None, confidence_max), capacity)
+
+        if not bits:
+            return set()
+        return {self._ids[slot] for slot in _bits_to_slots(bits, capacity)}
@@ -0,0 +1,231 @@
+from array import array
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from structures.note import Note, parse_confidence, parse_page_number
+
+# Sentinels for missing values in the numeric columns
+NO_PAGE = -1
+NO_BOOK = -1
+
+
+class NoteTable:
+    """
+    Column-oriented container for a user's notes.
+
+    Page numbers, confidence scores and book ids are kept in compact typed
+    arrays (books dictionary-encoded), tags as tuples of interned tag ids.
+    Rows are selected by index (see NoteIndex for filters); Note objects are
+    only built for the rows that are actually used.
+    """
+
+    __slots__ = (
+        "ids", "content", "quote", "comment",
+        "pages", "confidence", "book_codes", "tag_codes",
+        "book_ids", "tag_names",
+        "_book_index", "_tag_index", "_row_by_id",
+    )
+
+    def __init__(self, notes: Iterable[Note] = ()):
+        self.ids: list[str] = []
+        self.content: list[str] = []
+        self.quote: list[Optional[str]] = []
+        self.comment: list[Optional[str]] = []
+        self.pages = array("i")
+        self.confidence = array("d")
+        self.book_codes = array("i")
+        self.tag_codes: list[tuple[int, ...]] = []
+
+        self.book_ids: list[str] = []
+        self.tag_names: list[str] = []
+        self._book_index: dict[str, int] = {}
+        self._tag_index: dict[str, int] = {}
+        self._row_by_id: dict[str, int] = {}
+
+        self.extend(notes)
+
+    # --- Encoding ---
+
+    def _encode_book(self, book_id: Optional[str]) -> int:
+        if not book_id:
+            return NO_BOOK
+        code = self._book_index.get(book_id)
+        if code is None:
+            code = len(self.book_ids)
+            self.book_ids.append(book_id)
+            self._book_index[book_id] = code
+        return code
+
+    @staticmethod
+    def _page_code(page_number) -> int:
+        page = parse_page_number(page_number)
+        return NO_PAGE if page is None else page
+
+    @staticmethod
+    def _confidence_value(confidence_score) -> float:
+        confidence = parse_confidence(confidence_score)
+        return np.nan if confidence is None else confidence
+
+    def _encode_tags(self, tags: Optional[list[str]]) -> tuple[int, ...]:
+        if not tags:
+            return ()
+        codes = []
+        for tag in tags:
+            code = self._tag_index.get(tag)
+            if code is None:
+                code = len(self.tag_names)
+                self.tag_names.append(tag)
+                self._tag_index[tag] = code
+            codes.append(code)
+        return tuple(codes)
+
+    def _encode(self, note: Note) -> tuple[int, float, int, tuple[int, ...]]:
+        """
+        Encoded page, confidence, book and tags of a note.
+
+        Everything that can fail runs here, before any column is touched, so
+        a bad note cannot leave the columns with different lengths.
+        """
+        return (
+            self._page_code(note.page_number),
+            self._confidence_value(note.confidence_score),
+            self._encode_book(note.book_id),
+            self._encode_tags(note.tags),
+        )
+
+    # --- Mutation ---
+
+    def append(self, note: Note):
+        """Add a note at the end of the table."""
+        page, confidence, book_code, tag_codes = self._encode(note)
+        self._row_by_id[note.id] = len(self.ids)
+        self.ids.append(note.id)
+        self.content.append(note.content)
+        self.quote.append(note.quote)
+        self.comment.append(note.comment)
+        self.pages.append(page)
+        self.confidence.append(confidence)
+        self.book_codes.append(book_code)
+        self.tag_codes.append(tag_codes)
+
+    def extend(self, notes: Iterable[Note]):
+        for note in notes:
+            self.append(note)
+
+    def update(self, note: Note):
+        """Replace the row holding the note with the same id."""
+        row = self._row_by_id[note.id]
+        page, confidence, book_code, tag_codes = self._encode(note)
+        self.content[row] = note.content
+        self.quote[row] = note.quote
+        self.comment[row] = note.comment
+        self.pages[row] = page
+        self.confidence[row] = confidence
+        self.book_codes[row] = book_code
+        self.tag_codes[row] = tag_codes
+
+    def remove(self, note_ids: Iterable[str]):
+        """Drop the rows for the given note ids, keeping the order of the rest."""
+        drop = {self._row_by_id[i] for i in note_ids if i in self._row_by_id}
+        if not drop:
+            return
+        keep = [row for row in range(len(self.ids)) if row not in drop]
+
+        self.ids = [self.ids[row] for row in keep]
+        self.content = [self.content[row] for row in keep]
+        self.quote = [self.quote[row] for row in keep]
+        self.comment = [self.comment[row] for row in keep]
+        self.pages = array("i", (self.pages[row] for row in keep))
+        self.confidence = array("d", (self.confidence[row] for row in keep))
+        self.book_codes = array("i", (self.book_codes[row] for row in keep))
+        self.tag_codes = [self.tag_codes[row] for row in keep]
+        self._row_by_id = {note_id: row for row, note_id in enumerate(self.ids)}
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._row_by_id
+
+    def __iter__(self) -> Iterator[Note]:
+        for row in range(len(self.ids)):
+            yield self.note(row)
+
+    def present_book_ids(self) -> set[str]:
+        """Ids of the books that have at least one note in the table."""
+        return {self.book_ids[code] for code in set(self.book_codes) if code != NO_BOOK}
+
+    def rows_of(self, note_ids: Iterable[str]) -> np.ndarray:
+        """Sorted row indices of the given note ids (unknown ids are skipped)."""
+        rows = [self._row_by_id[i] for i in note_ids if i in self._row_by_id]
+        return np.sort(np.array(rows, dtype=np.intp))
+
+    def row_of(self, note_id: str) -> Optional[int]:
+        return self._row_by_id.get(note_id)
+
+    def note(self, row: int) -> Note:
+        """Materialize a single row as a Note."""
+        page = self.pages[row]
+        confidence = self.confidence[row]
+        book_code = self.book_codes[row]
+        tag_codes = self.tag_codes[row]
+
+        return Note(
+            content=self.content[row],
+            id=self.ids[row],
+            page_number=page if page != NO_PAGE else None,
+            quote=self.quote[row],
+            comment=self.comment[row],
+            book_id=self.book_ids[book_code] if book_code != NO_BOOK else None,
+            tags=[self.tag_names[c] for c in tag_codes] if tag_codes else None,
+            confidence_score=confidence if confidence == confidence else None,  # NaN check
+        )
+
+    def notes(self, rows: Optional[Iterable[int]] = None) -> list[Note]:
+        """Materialize the given rows (all rows by default) as Notes."""
+        if rows is None:
+            return list(self)
+        return [self.note(int(row)) for row in rows]
+
+    def columns(self, rows: Optional[np.ndarray] = None) -> dict[str, list]:
+        """
+        Column-wise view of the given rows, ready for a DataFrame.
+
+        Builds no Note objects, so it is cheap for large selections.
+        """
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        rows = [int(row) for row in rows]
+
+        return {
+            "id": [self.ids[row] for row in rows],
+            "book_id": [
+                self.book_ids[self.book_codes[row]] if self.book_codes[row] != NO_BOOK else None
+                for row in rows
+            ],
+            "page_number": [self.pages[row] if self.pages[row] != NO_PAGE else None for row in rows],
+            "quote": [self.quote[row] for row in rows],
+            "comment": [self.comment[row] or self.content[row] for row in rows],
+            "tags": [[self.tag_names[c] for c in self.tag_codes[row]] for row in rows],
+            "confidence_score": [self.confidence[row] for row in rows],
+        }
+
+    # --- Row selection ---
+
+    def all_rows(self) -> np.ndarray:
+        """Every row index, in table order."""
+        return np.arange(len(self.ids), dtype=np.intp)
+
+    def book_rows(self, book_id: Optional[str]) -> np.ndarray:
+        """
+        Row indices of a book's notes (notes without a book for None), in table order.
+
+        Tag, page and confidence filters are answered by NoteIndex.
+        """
+        code = self._book_index.get(book_id) if book_id else NO_BOOK
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(np.asarray(self.book_codes, dtype=np.int32) == code)
@@ -21,9 +21,51 @@ create table notes (
   created_at timestamp with time zone default timezone('utc'::text, now()) not null
 );
 
+-- Content hashes of the files sent in the last incremental Obsidian export
+create table export_manifests (
+  user_id uuid primary key references auth.users,
+  manifest jsonb not null default '{}'::jsonb,
+  updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Book digests: one summary per page range of a book's notes, plus the merged
+-- book summary (chunk = 'book'), each with the hash of what it summarizes
+create table book_summaries (
+  user_id uuid references auth.users not null,
+  book_id uuid references books(id) on delete cascade not null,
+  chunk text not null,
+  notes_hash text not null,
+  note_count integer not null,
+  summary text not null,
+  updated_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  primary key (book_id, chunk)
+);
+
+-- Bulk tag edits from the notes page: one statement for any number of notes.
+-- Added tags go last, in order, without duplicates. security invoker keeps
+-- the notes RLS policies in force.
+create or replace function edit_note_tags(note_ids uuid[], added text[], removed text[])
+returns table (id uuid, tags text[])
+language sql
+security invoker
+as $$
+  update notes n
+  set tags = array(
+    select t from unnest(coalesce(n.tags, '{}') || added) with ordinality as edited(t, i)
+    where not t = any(removed)
+    group by t
+    order by min(i)
+  )
+  where n.id = any(note_ids)
+    and (not coalesce(n.tags, '{}') @> added or n.tags && removed)
+  returning n.id, n.tags;
+$$;
+
 -- ENABLE ROW LEVEL SECURITY (RLS)
 alter table books enable row level security;
 alter table notes enable row level security;
+alter table export_manifests enable row level security;
+alter table book_summaries enable row level security;
 
 -- Create Policies for BOOKS
 create policy "Users can select their own books"
@@ -49,4 +91,27 @@ create policy "Users can update their own notes"
 on notes for update using (auth.uid() = user_id);
 
 create policy "Users can delete their own notes"
-on notes for delete using (auth.uid() = user_id);
\ No newline at end of file
+on notes for delete using (auth.uid() = user_id);
+
+-- Create Policies for EXPORT MANIFESTS
+create policy "Users can select their own export manifest"
+on export_manifests for select using (auth.uid() = user_id);
+
+create policy "Users can insert their own export manifest"
+on export_manifests for insert with check (auth.uid() = user_id);
+
+create policy "Users can update their own export manifest"
+on export_manifests for update using (auth.uid() = user_id);
+
+-- Create Policies for BOOK SUMMARIES
+create policy "Users can select their own book summaries"
+on book_summaries for select using (auth.uid() = user_id);
+
+create policy "Users can insert their own book summaries"
+on book_summaries for insert with check (auth.uid() = user_id);
+
+create policy "Users can update their own book summaries"
+on book_summaries for update using (auth.uid() = user_id);
+
+create policy "Users can delete their own book summaries"
+on book_summaries for delete using (auth.uid() = user_id);
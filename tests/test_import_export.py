@@ -0,0 +1,101 @@
+import io
+import threading
+import zipfile
+
+from benchmarks.library import generate_library
+from structures.book import Book
+from structures.note import Note
+from utils.export import generate_book_markdown, generate_csv_export, generate_obsidian_export, markdown_hash
+from utils.importer import parse_csv_import, parse_import_file, parse_markdown_import
+
+BOOKS = [
+    Book(title="Dune", author="Frank Herbert"),
+    Book(title="Ten Essays: Vol. 1", author="Anonymous"),
+]
+
+NOTES = [
+    Note(content="raw", book_id=BOOKS[0].id, page_number=12, quote="Fear is the mind-killer.",
+         comment="The litany again.", tags=["quote", "idea"], confidence_score=0.9),
+    Note(content="raw", book_id=BOOKS[0].id, page_number=45, comment="Why does he trust her?",
+         tags=["question"], confidence_score=0.7),
+    Note(content="raw", book_id=BOOKS[0].id, quote="A beginning is a very delicate time.", tags=["summary"]),
+    Note(content="raw", book_id=BOOKS[1].id, page_number=3, quote="Happiness is a choice.",
+         comment="Circumstances matter too.", tags=["critique"]),
+    Note(content="raw", comment="No book for this one."),
+]
+
+TITLES = {book.id: book.title for book in BOOKS}
+
+
+def _key(note: Note) -> tuple:
+    return (note.page_number, note.quote, note.comment, tuple(note.tags or ()))
+
+
+def _expected() -> set:
+    return {(TITLES.get(n.book_id), _key(n)) for n in NOTES}
+
+
+def _zip_files(data: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def test_csv_round_trip():
+    records = parse_csv_import(generate_csv_export(BOOKS, NOTES))
+
+    assert {(r.title, _key(r.note)) for r in records} == _expected()
+    assert {r.note.confidence_score for r in records} == {0.9, 0.7, None}
+    assert {r.author for r in records if r.title == "Dune"} == {"Frank Herbert"}
+
+
+def test_obsidian_zip_round_trip():
+    records = parse_import_file("export.zip", generate_obsidian_export(BOOKS, NOTES, workers=1))
+
+    assert {(r.title, _key(r.note)) for r in records} == _expected()
+    assert {r.author for r in records if r.title == "Ten Essays: Vol. 1"} == {"Anonymous"}
+
+
+def test_markdown_round_trip_keeps_multiline_text():
+    note = Note(content="raw", book_id=BOOKS[0].id, page_number=7, quote="First line\nsecond line",
+                comment="A comment\n\nover two paragraphs", tags=["connection"])
+
+    [record] = parse_markdown_import(generate_book_markdown(BOOKS[0], [note]))
+
+    assert _key(record.note) == _key(note)
+
+
+def test_markdown_hash_ignores_only_the_frontmatter_date():
+    note = Note(content="raw", comment="exported: in the note text")
+    content = generate_book_markdown(BOOKS[0], [note])
+    other_day = content.replace("exported: 20", "exported: 19", 1)
+    edited = content.replace("exported: in the note text", "exported: edited")
+
+    assert other_day != content
+    assert markdown_hash(other_day) == markdown_hash(content)
+    assert markdown_hash(edited) != markdown_hash(content)
+
+
+def test_concurrent_parallel_exports_share_the_pool():
+    # Different book counts and worker counts, as two sessions exporting at once
+    libraries = [generate_library(9, 60, seed=1), generate_library(20, 120, seed=2)]
+    expected = [generate_obsidian_export(books, notes, workers=1) for books, notes in libraries]
+    results, errors = {}, []
+    start = threading.Barrier(len(libraries))
+
+    def run(i, workers):
+        try:
+            start.wait()
+            results[i] = [generate_obsidian_export(*libraries[i], workers=workers) for _ in range(3)]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i, i + 2)) for i in range(len(libraries))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    for i, zips in results.items():
+        # ZIP entry times can tick over between exports; compare the files
+        assert [_zip_files(z) for z in zips] == [_zip_files(expected[i])] * 3
@@ -0,0 +1,58 @@
+import pytest
+
+from utils.metrics import (
+    AUDIO_BYTES, LLM_TOKENS, PARSE_ROUTES, STAGE_ERRORS, STAGE_SECONDS, Counter, Histogram, render_openmetrics,
+)
+
+parser = pytest.importorskip("prometheus_client.openmetrics.parser")
+
+
+def _families(text: str) -> dict:
+    return {family.name: family for family in parser.text_string_to_metric_families(text)}
+
+
+def test_render_openmetrics_parses():
+    STAGE_SECONDS.observe(0.3, stage="parse", provider="groq", model="m")
+    STAGE_SECONDS.observe(1.2, stage="parse", provider="groq", model="m")
+    STAGE_ERRORS.inc(stage="parse", provider="groq", model="m")
+    AUDIO_BYTES.observe(50_000)
+    LLM_TOKENS.inc(120, kind="prompt", provider="groq", model="m")
+    PARSE_ROUTES.inc(model="m", reason="short")
+
+    families = _families(render_openmetrics())
+
+    assert families["marginal_stage_seconds"].type == "histogram"
+    assert families["marginal_stage_seconds"].unit == "seconds"
+    assert families["marginal_stage_recent_seconds"].type == "summary"
+    assert families["marginal_stage_recent_seconds"].unit == "seconds"
+    assert families["marginal_audio_bytes"].unit == "bytes"
+    assert families["marginal_stage_errors"].type == "counter"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Test.", (0.1, 1.0), unit="seconds")
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="x")
+
+    text = "\n".join(histogram.render() + histogram.render_summary() + ["# EOF"]) + "\n"
+    samples = {
+        (s.name, s.labels.get("le")): s.value
+        for family in _families(text).values() for s in family.samples
+    }
+
+    assert samples[("test_latency_seconds_bucket", "0.1")] == 1
+    assert samples[("test_latency_seconds_bucket", "1.0")] == 3
+    assert samples[("test_latency_seconds_bucket", "+Inf")] == 4
+    assert samples[("test_latency_seconds_count", None)] == 4
+    assert samples[("test_latency_recent_seconds_count", None)] == 4
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_events", "Test.")
+    counter.inc(reason='say "hi"\nback\\slash')
+
+    text = "\n".join(counter.render() + ["# EOF"]) + "\n"
+    sample = _families(text)["test_events"].samples[0]
+
+    assert sample.labels["reason"] == 'say "hi"\nback\\slash'
+    assert sample.value == 1
@@ -0,0 +1,93 @@
+import random
+from collections import Counter
+
+from structures.note import Note
+from structures.note_index import NoteIndex
+
+TAGS = ["quote", "idea", "question", "critique", "summary"]
+BOOKS = ["b1", "b2", "b3"]
+
+
+def _random_note(rng: random.Random, note_id: str) -> Note:
+    return Note(
+        content=note_id,
+        id=note_id,
+        page_number=rng.choice([None, rng.randint(1, 60)]),
+        book_id=rng.choice([None] + BOOKS),
+        tags=rng.sample(TAGS, rng.randint(0, 3)) or None,
+        confidence_score=rng.choice([None, round(rng.random(), 2)]),
+    )
+
+
+def _random_query(rng: random.Random) -> dict:
+    query = {}
+    if rng.random() < 0.5:
+        query["book_id"] = rng.choice(BOOKS + ["missing"])
+    if rng.random() < 0.5:
+        query["tags"] = rng.sample(TAGS + ["missing"], rng.randint(0, 3))
+        query["match_all_tags"] = rng.random() < 0.5
+    if rng.random() < 0.5:
+        query["page_min"] = rng.choice([None, rng.randint(1, 60)])
+        query["page_max"] = rng.choice([None, rng.randint(1, 60)])
+    if rng.random() < 0.3:
+        query["confidence_max"] = round(rng.random(), 2)
+    return query
+
+
+def _matches(note: Note, book_id=None, tags=None, match_all_tags=False,
+             page_min=None, page_max=None, confidence_max=None) -> bool:
+    """Brute-force reading of NoteIndex.query's criteria."""
+    if book_id is not None and note.book_id != book_id:
+        return False
+    if tags is not None:
+        note_tags = set(note.tags or ())
+        if match_all_tags and not set(tags) <= note_tags:
+            return False
+        if not match_all_tags and note_tags.isdisjoint(tags):
+            return False
+    if page_min is not None or page_max is not None:
+        if note.page_number is None:
+            return False
+        if page_min is not None and note.page_number < page_min:
+            return False
+        if page_max is not None and note.page_number > page_max:
+            return False
+    if confidence_max is not None and (note.confidence_score is None or note.confidence_score > confidence_max):
+        return False
+    return True
+
+
+def test_incremental_index_matches_brute_force():
+    rng = random.Random(0)
+    notes = {f"n{i}": _random_note(rng, f"n{i}") for i in range(100)}
+    index = NoteIndex(notes.values())
+    next_id = len(notes)
+
+    for _ in range(3000):
+        action = rng.random()
+        if action < 0.4 or not notes:
+            note = _random_note(rng, f"n{next_id}")
+            next_id += 1
+            notes[note.id] = note
+            index.add(note)
+        elif action < 0.7:
+            note = _random_note(rng, rng.choice(list(notes)))
+            notes[note.id] = note
+            index.update(note)
+        else:
+            note_id = rng.choice(list(notes))
+            del notes[note_id]
+            index.remove(note_id)
+
+        query = _random_query(rng)
+        assert index.query(**query) == {n.id for n in notes.values() if _matches(n, **query)}, query
+        assert len(index) == len(notes)
+
+    expected_counts = Counter(tag for note in notes.values() for tag in set(note.tags or ()))
+    assert index.tag_counts() == dict(sorted(expected_counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def test_string_pages_and_confidence_are_coerced():
+    index = NoteIndex([Note(content="a", id="a", page_number="12", confidence_score="0.4")])
+
+    assert index.query(page_min=10, page_max=12, confidence_max=0.5) == {"a"}
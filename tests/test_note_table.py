@@ -0,0 +1,58 @@
+from structures.note import Note
+from structures.note_table import NO_PAGE, NoteTable
+
+
+def _table() -> NoteTable:
+    return NoteTable([
+        Note(content="a", id="a", book_id="b1", page_number=30, tags=["idea"], confidence_score=0.9),
+        Note(content="b", id="b", book_id="b1", page_number=10, tags=["quote", "idea"], confidence_score=0.5),
+        Note(content="c", id="c", book_id="b2", tags=["question"]),
+        Note(content="d", id="d", book_id="b2", page_number=10, confidence_score=0.7),
+    ])
+
+
+def _ids(table: NoteTable, rows) -> list[str]:
+    return [table.ids[int(row)] for row in rows]
+
+
+def test_book_rows_in_table_order():
+    table = _table()
+    table.append(Note(content="e", id="e"))
+
+    assert _ids(table, table.book_rows("b1")) == ["a", "b"]
+    assert _ids(table, table.book_rows(None)) == ["e"]
+    assert _ids(table, table.book_rows("missing")) == []
+    assert _ids(table, table.all_rows()) == ["a", "b", "c", "d", "e"]
+
+
+def test_update_and_remove_keep_rows_consistent():
+    table = _table()
+    table.update(Note(content="b2", id="b", book_id="b3", page_number=5, tags=["new"]))
+    table.remove(["a"])
+
+    assert len(table) == 3 and "a" not in table
+    assert table.note(table.row_of("b")) == Note(content="b2", id="b", book_id="b3", page_number=5, tags=["new"])
+    assert _ids(table, table.book_rows("b3")) == ["b"]
+    assert table.present_book_ids() == {"b2", "b3"}
+
+
+def test_pages_from_llm_answers_are_coerced():
+    table = NoteTable([
+        Note(content="a", id="a", page_number="45"),
+        Note(content="b", id="b", page_number=12.0),
+        Note(content="c", id="c", page_number="page forty"),
+    ])
+
+    assert list(table.pages) == [45, 12, NO_PAGE]
+    assert [note.page_number for note in table] == [45, 12, None]
+
+
+def test_confidence_from_llm_answers_is_coerced_before_any_column_changes():
+    table = _table()
+    table.append(Note(content="e", id="e", page_number=3, confidence_score="0.9"))
+    table.append(Note(content="f", id="f", confidence_score="very sure"))
+    table.update(Note(content="a", id="a", page_number=2 ** 40, confidence_score="0.4"))
+
+    assert {len(column) for column in (table.ids, table.content, table.pages, table.confidence, table.tag_codes)} == {6}
+    assert [table.note(table.row_of(i)).confidence_score for i in ("e", "f", "a")] == [0.9, None, 0.4]
+    assert table.note(table.row_of("a")).page_number is None
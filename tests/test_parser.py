@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import utils.parser as parser
+from utils.parser import FAST_PARSE_MODEL, PARSE_MODEL, RoutingPolicy, parse_note_content
+
+POLICY = RoutingPolicy()
+
+
+class FakeClient:
+    """OpenAI-style client answering chat completions from a dict of model -> content."""
+
+    base_url = "http://fake"
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.models.append(model)
+        answer = self.answers[model]
+        content = answer if isinstance(answer, str) else json.dumps(answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+@pytest.fixture(autouse=True)
+def no_book(monkeypatch):
+    monkeypatch.setattr(parser, "st", SimpleNamespace(session_state=SimpleNamespace(current_book_obj=None)))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Page 12. I love this line.", (FAST_PARSE_MODEL, "short")),
+    ("word " * 61, (PARSE_MODEL, "long")),
+    ("Page 12 says one thing, and page 40 says the opposite.", (PARSE_MODEL, "multi_part")),
+    ("One. Two. Three. Four. Five.", (PARSE_MODEL, "multi_part")),
+    ("One. Two. Three. Four.", (FAST_PARSE_MODEL, "short")),
+])
+def test_route(text, expected):
+    assert POLICY.route(text) == expected
+
+
+def test_large_mode_always_routes_to_the_large_model():
+    assert RoutingPolicy(mode="large").route("Page 1. Short.") == (PARSE_MODEL, "forced")
+
+
+@pytest.mark.parametrize("parsed, expected", [
+    ({"page_number": 3, "comment": "x", "confidence_score": 0.9}, None),
+    ({"page_number": 3, "comment": "x", "confidence_score": 0.5}, "low_confidence"),
+    ({"page_number": 3, "comment": "x"}, "low_confidence"),
+    ({"page": 3, "confidence_score": 0.9}, "invalid"),
+    (None, "invalid"),
+    (["not", "a", "dict"], "invalid"),
+])
+def test_escalation(parsed, expected):
+    assert POLICY.escalation(parsed) == expected
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("MARGINAL_PARSE_ROUTING", "large")
+    monkeypatch.setenv("MARGINAL_PARSE_MAX_WORDS", "20")
+    monkeypatch.setenv("MARGINAL_PARSE_MIN_CONFIDENCE", "0.6")
+    policy = RoutingPolicy.from_env()
+    assert (policy.mode, policy.max_words, policy.min_confidence) == ("large", 20, 0.6)
+
+    monkeypatch.setenv("MARGINAL_PARSE_ROUTING", "fast")
+    with pytest.raises(ValueError):
+        RoutingPolicy.from_env()
+
+
+def test_confident_fast_answer_is_kept():
+    answer = {"page_number": 3, "comment": "Nice.", "tags": ["remark"], "confidence_score": 0.95}
+    client = FakeClient({FAST_PARSE_MODEL: answer})
+
+    assert parse_note_content("Page 3. Nice.", client, POLICY) == answer
+    assert client.models == [FAST_PARSE_MODEL]
+
+
+def test_low_confidence_escalates_to_the_large_model():
+    large = {"page_number": 3, "comment": "Nice.", "tags": ["remark"], "confidence_score": 0.9}
+    client = FakeClient({FAST_PARSE_MODEL: {"comment": "Nice.", "confidence_score": 0.3}, PARSE_MODEL: large})
+
+    assert parse_note_content("Page 3. Nice.", client, POLICY) == large
+    assert client.models == [FAST_PARSE_MODEL, PARSE_MODEL]
+
+
+def test_low_confidence_answer_is_kept_if_the_large_model_fails():
+    fast = {"comment": "Nice.", "confidence_score": 0.3}
+    client = FakeClient({FAST_PARSE_MODEL: fast, PARSE_MODEL: "not json"})
+
+    assert parse_note_content("Page 3. Nice.", client, POLICY) == fast
+
+
+def test_invalid_fast_answer_escalates():
+    large = {"comment": "Nice.", "confidence_score": 0.9}
+    client = FakeClient({FAST_PARSE_MODEL: "not json", PARSE_MODEL: large})
+
+    assert parse_note_content("Page 3. Nice.", client, POLICY) == large
+
+
+def test_long_transcript_goes_straight_to_the_large_model():
+    client = FakeClient({PARSE_MODEL: {"comment": "Long.", "confidence_score": 0.4}})
+
+    parse_note_content("word " * 100, client, POLICY)
+    assert client.models == [PARSE_MODEL]
@@ -0,0 +1,35 @@
+from dataclasses import replace
+
+import utils.related as related
+from structures.note import Note
+from utils.related import RelatedNotesIndex
+
+
+def test_sync_only_embeds_changed_notes(monkeypatch):
+    notes = [
+        Note(content="raw", id="a", book_id="b1", quote="The spice must flow."),
+        Note(content="raw", id="b", book_id="b1", comment="Spice trade and the guild."),
+        Note(content="raw", id="c", book_id="b2", comment="Gardening in the desert."),
+    ]
+    index = RelatedNotesIndex(notes)
+
+    embedded = []
+    embed_text = related.embed_text
+    monkeypatch.setattr(related, "embed_text", lambda text: embedded.append(text) or embed_text(text))
+
+    index.sync(notes)
+    assert embedded == []
+
+    edited = replace(notes[2], comment="The spice flows through the guild.")
+    moved = replace(notes[1], book_id="b3")
+    added = Note(content="A new note about spice", id="d", book_id="b2")
+    index.sync([notes[0], moved, edited, added])
+
+    assert sorted(embedded) == sorted(["Spice trade and the guild.", "The spice flows through the guild.",
+                                       "A new note about spice"])
+    assert len(index) == 4
+    assert "d" in index and index.related("a", k=3)
+
+    index.sync([notes[0]])
+    assert len(index) == 1 and "d" not in index
+    assert index.related("a") == []
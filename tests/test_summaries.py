@@ -0,0 +1,158 @@
+import threading
+from dataclasses import replace
+from types import SimpleNamespace
+
+from structures.book import Book
+from structures.note import Note
+from utils.summaries import BOOK_KEY, UNPAGED_KEY, MAP_PROMPT, chunk_notes, notes_hash, summarize_book
+
+
+class FakeQuery:
+    """Just enough of a postgrest builder for book_summaries."""
+
+    def __init__(self, db: "FakeDB", action: str, payload=None):
+        self.db = db
+        self.action = action
+        self.payload = payload
+        self.filters = []
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row[column] in values)
+        return self
+
+    def execute(self):
+        self.db.requests += 1
+        rows = self.db.rows
+        matches = [row for row in rows.values() if all(f(row) for f in self.filters)]
+        if self.action == "select":
+            return SimpleNamespace(data=[dict(row) for row in matches])
+        if self.action == "delete":
+            for row in matches:
+                del rows[(row["book_id"], row["chunk"])]
+            return SimpleNamespace(data=matches)
+        for row in self.payload:
+            rows[(row["book_id"], row["chunk"])] = dict(row)
+        return SimpleNamespace(data=self.payload)
+
+
+class FakeTable:
+    def __init__(self, db):
+        self.db = db
+
+    def select(self, columns="*"):
+        return FakeQuery(self.db, "select")
+
+    def upsert(self, rows, on_conflict=None):
+        assert on_conflict == "book_id,chunk"
+        return FakeQuery(self.db, "upsert", rows)
+
+    def delete(self):
+        return FakeQuery(self.db, "delete")
+
+
+class FakeDB:
+    def __init__(self):
+        self.rows = {}
+        self.requests = 0
+
+    def table(self, name):
+        assert name == "book_summaries"
+        return FakeTable(self)
+
+
+class FakeLLM:
+    """Answers every chat completion with a numbered summary and records the calls."""
+
+    base_url = "http://fake"
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages):
+        with self._lock:
+            self.calls.append("map" if messages[0]["content"] == MAP_PROMPT else "reduce")
+            content = f"summary {len(self.calls)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+BOOK = Book(title="Dune", author="Frank Herbert")
+
+
+def _notes() -> list[Note]:
+    pages = [3, 20, 49, 51, 80, 120, None]
+    return [
+        Note(content=f"note {i}", id=f"n{i}", book_id=BOOK.id, page_number=page, comment=f"comment {i}")
+        for i, page in enumerate(pages)
+    ]
+
+
+def test_chunk_notes_groups_by_page_range():
+    chunks = chunk_notes(_notes())
+
+    assert [key for key, _ in chunks] == ["pages:1-50", "pages:51-100", "pages:101-150", UNPAGED_KEY]
+    assert [len(notes) for _, notes in chunks] == [3, 2, 1, 1]
+
+
+def test_notes_hash_ignores_order_but_not_edits():
+    notes = _notes()
+
+    assert notes_hash(notes) == notes_hash(list(reversed(notes)))
+    assert notes_hash(notes) != notes_hash([replace(notes[0], comment="edited")] + notes[1:])
+
+
+def test_summarize_book_only_redoes_changed_chunks():
+    db, llm = FakeDB(), FakeLLM()
+    notes = _notes()
+
+    digest = summarize_book(db, llm, "u", BOOK, notes)
+    assert sorted(llm.calls) == ["map"] * 4 + ["reduce"]
+    assert digest.note_count == 7
+    assert [chunk.label for chunk in digest.chunks] == [
+        "Pages 1–50", "Pages 51–100", "Pages 101–150", "Notes without a page",
+    ]
+    assert {chunk for _, chunk in db.rows} == {"pages:1-50", "pages:51-100", "pages:101-150", UNPAGED_KEY, BOOK_KEY}
+
+    # Unchanged: no LLM call, just the read
+    llm.calls.clear()
+    db.requests = 0
+    again = summarize_book(db, llm, "u", BOOK, notes)
+    assert llm.calls == []
+    assert db.requests == 1
+    assert again == digest
+
+    # One note edited: its range and the reduce
+    notes[4] = replace(notes[4], comment="edited")
+    summarize_book(db, llm, "u", BOOK, notes)
+    assert llm.calls == ["map", "reduce"]
+
+    # A range emptied: no map, the reduce, and its stored summary deleted
+    llm.calls.clear()
+    notes = [note for note in notes if note.page_number != 120]
+    digest = summarize_book(db, llm, "u", BOOK, notes)
+    assert llm.calls == ["reduce"]
+    assert "pages:101-150" not in {chunk for _, chunk in db.rows}
+    assert len(digest.chunks) == 3
+
+
+def test_single_range_needs_no_reduce():
+    db, llm = FakeDB(), FakeLLM()
+    notes = [note for note in _notes() if note.page_number and note.page_number <= 50]
+
+    digest = summarize_book(db, llm, "u", BOOK, notes)
+
+    assert llm.calls == ["map"]
+    assert digest.summary == digest.chunks[0].summary
+
+
+def test_book_without_notes_drops_its_digest():
+    db, llm = FakeDB(), FakeLLM()
+    summarize_book(db, llm, "u", BOOK, _notes())
+
+    assert summarize_book(db, llm, "u", BOOK, []) is None
+    assert db.rows == {}
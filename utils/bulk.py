@@ -0,0 +1,62 @@
+"""
+Batched writes for the multi-select actions on the notes and books pages.
+
+Each action is one request whatever the selection size: deletes and moves
+use an `in` filter, tag edits call the edit_note_tags function from
+supabase_schema.sql, which updates every note in a single statement. Very
+large selections are split so the `in` filter keeps the URL under proxy
+limits.
+"""
+
+from typing import Iterable
+
+# Ids per `in` filter: about 7.5 KB of URL, under the usual 8 KB proxy limit
+IN_FILTER_BATCH_SIZE = 200
+
+
+def _batches(ids: list[str]) -> Iterable[list[str]]:
+    for start in range(0, len(ids), IN_FILTER_BATCH_SIZE):
+        yield ids[start:start + IN_FILTER_BATCH_SIZE]
+
+
+def normalize_tags(tags: Iterable[str]) -> list[str]:
+    """Turn user input like "#To read" into tags like "to-read", without duplicates."""
+    normalized = []
+    for tag in tags:
+        tag = "-".join(tag.strip().lstrip("#").lower().split())
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def delete_notes(client, note_ids: list[str]):
+    for batch in _batches(note_ids):
+        client.table("notes").delete().in_("id", batch).execute()
+
+
+def move_notes(client, note_ids: list[str], book_id: str):
+    for batch in _batches(note_ids):
+        client.table("notes").update({"book_id": book_id}).in_("id", batch).execute()
+
+
+def edit_tags(client, note_ids: list[str], added: list[str], removed: list[str]) -> dict[str, list[str]]:
+    """Add and remove tags on the notes; returns the new tags of every note that changed."""
+    response = client.rpc("edit_note_tags", {
+        "note_ids": note_ids,
+        "added": added,
+        "removed": removed,
+    }).execute()
+    return {row["id"]: row["tags"] or [] for row in response.data}
+
+
+def delete_books(client, book_ids: list[str]):
+    """Delete the books; their notes go with them (notes.book_id cascades)."""
+    for batch in _batches(book_ids):
+        client.table("books").delete().in_("id", batch).execute()
+
+
+def merge_books(client, book_ids: list[str], into_book_id: str):
+    """Move every note of the books to another book, then delete the emptied books."""
+    for batch in _batches(book_ids):
+        client.table("notes").update({"book_id": into_book_id}).in_("book_id", batch).execute()
+    delete_books(client, book_ids)
@@ -0,0 +1,37 @@
+import streamlit as st
+import os
+
+# The OpenAI SDK is imported inside each function: it takes most of a second
+# to import and pages that never call an LLM should not pay for it.
+
+@st.cache_resource
+def get_openai_client():
+    """Returns cached OpenAI client instance."""
+    try:
+        api_key = st.secrets.get("OpenAI_key")
+    except (FileNotFoundError, AttributeError):
+        api_key = None
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing OpenAI API key configuration")
+
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+@st.cache_resource
+def get_groq_client():
+    try:
+        api_key = st.secrets.get("GROQ_API_KEY")
+    except (FileNotFoundError, AttributeError):
+        api_key = None
+
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("Missing Groq API key configuration")
+
+    from openai import OpenAI
+    return OpenAI(
+        api_key=api_key,
+        base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+    )
@@ -1,5 +1,5 @@
 import streamlit as st
-from supabase import create_client
+from utils.profiler import wrap_client
 import os
 
 def _get_supabase_config():
@@ -19,6 +19,13 @@ def _get_supabase_config():
 
     return supabase_url, supabase_key
 
+def _create_client(supabase_url, supabase_key):
+    """Creates a profiled Supabase client, importing the SDK on first use."""
+    # The SDK takes about half a second to import: not worth it for the login page
+    from supabase import create_client
+
+    return wrap_client(create_client(supabase_url, supabase_key))
+
 def get_supabase_client():
     """
     Get a base Supabase client for authentication operations.
@@ -27,7 +34,7 @@ def get_supabase_client():
     """
     try:
         supabase_url, supabase_key = _get_supabase_config()
-        return create_client(supabase_url, supabase_key)
+        return _create_client(supabase_url, supabase_key)
     except Exception as e:
         st.error(f"Error getting Supabase client: {e}")
         st.stop()
@@ -42,7 +49,7 @@ def get_authenticated_client():
     """
     try:
         supabase_url, supabase_key = _get_supabase_config()
-        client = create_client(supabase_url, supabase_key)
+        client = _create_client(supabase_url, supabase_key)
 
         # CRITICAL: Set the session with JWT tokens for RLS enforcement
         if st.session_state.get("session"):
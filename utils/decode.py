@@ -0,0 +1,90 @@
+"""
+Decoding of Supabase response rows into domain objects.
+
+Rows may carry columns the dataclasses don't know about (user_id,
+created_at, or anything added to the schema later). They are dropped, or
+renamed through COLUMN_ALIASES, so schema drift never breaks a page.
+Timestamps are never decoded: no page reads them.
+"""
+
+import logging
+import time
+from dataclasses import fields
+from typing import TYPE_CHECKING, Iterable, Iterator, TypeVar
+
+from structures.book import Book
+from structures.note import Note
+
+if TYPE_CHECKING:
+    # NoteTable pulls in NumPy; the sidebar only decodes books
+    from structures.note_table import NoteTable
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Database column -> dataclass field, for columns renamed in the schema
+COLUMN_ALIASES: dict[type, dict[str, str]] = {
+    Book: {},
+    Note: {},
+}
+
+
+def _columns_for(cls: type, row: dict) -> list[tuple[str, str]]:
+    """(column, field) pairs to copy, worked out once from the first row."""
+    field_names = {f.name for f in fields(cls)}
+    aliases = COLUMN_ALIASES.get(cls, {})
+    columns = []
+    for column in row:
+        name = aliases.get(column, column)
+        if name in field_names:
+            columns.append((column, name))
+    return columns
+
+
+def iter_decode(cls: type[T], rows: Iterable[dict]) -> Iterator[T]:
+    """
+    Lazily decode rows into instances of the dataclass cls.
+
+    PostgREST returns the same columns for every row of a response, so the
+    column mapping is computed from the first row and reused.
+    """
+    columns = None
+    for row in rows:
+        if columns is None:
+            columns = _columns_for(cls, row)
+        yield cls(**{name: row.get(column) for column, name in columns})
+
+
+def _timed_decode(cls: type[T], rows: list[dict]) -> list[T]:
+    start = time.perf_counter()
+    decoded = list(iter_decode(cls, rows))
+    logger.debug(
+        "Decoded %d %s rows in %.2f ms",
+        len(decoded), cls.__name__, (time.perf_counter() - start) * 1000
+    )
+    return decoded
+
+
+def decode_books(rows: list[dict]) -> list[Book]:
+    """Decode a books response payload."""
+    return _timed_decode(Book, rows)
+
+
+def decode_notes(rows: list[dict]) -> list[Note]:
+    """Decode a notes response payload."""
+    return _timed_decode(Note, rows)
+
+
+def decode_note_table(rows: list[dict]) -> "NoteTable":
+    """Decode a notes response payload straight into a NoteTable."""
+    from structures.note_table import NoteTable
+
+    start = time.perf_counter()
+    table = NoteTable(iter_decode(Note, rows))
+    logger.debug(
+        "Decoded %d Note rows into a NoteTable in %.2f ms",
+        len(table), (time.perf_counter() - start) * 1000
+    )
+    return table
+
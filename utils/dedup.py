@@ -0,0 +1,104 @@
+"""
+Near-duplicate detection for new notes, using MinHash with LSH banding.
+
+Each note's transcript and quote are reduced to character shingles, then
+to a MinHash signature. Signatures are split into bands, and notes that
+share a band land in the same bucket. A check only compares against
+bucket-mates, so it stays well under a millisecond whatever the book size.
+"""
+
+import re
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from structures.note import Note
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard almost always collide
+
+# Estimated Jaccard similarity above which a new note is a likely duplicate
+DUPLICATE_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240101)  # Fixed seed: signatures must be stable
+_A = _rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+WHITESPACE_RE = re.compile(r"\s+")
+PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def note_text(note: Note) -> str:
+    """Text compared for duplicates: the transcript and the quote."""
+    return " ".join(t for t in (note.content, note.quote) if t)
+
+
+def _shingles(text: str) -> np.ndarray:
+    text = PUNCTUATION_RE.sub("", text.lower())
+    text = WHITESPACE_RE.sub(" ", text).strip()
+    if len(text) < SHINGLE_SIZE:
+        text = text.ljust(SHINGLE_SIZE)
+    hashes = {zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of NUM_PERMUTATIONS values for text."""
+    shingles = _shingles(text)
+    # (a * x + b) mod p for every permutation and shingle; x < 2**32 and
+    # a < 2**61 so the product wraps, which is fine for hashing purposes
+    hashed = (np.outer(_A, shingles) + _B[:, None]) % _MERSENNE_PRIME
+    return hashed.min(axis=1)
+
+
+class DuplicateIndex:
+    """LSH index of MinHash signatures for the notes of one book."""
+
+    __slots__ = ("_signatures", "_buckets")
+
+    def __init__(self):
+        self._signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in np.split(signature, BANDS)]
+
+    def add(self, note_id: str, text: str):
+        self.remove(note_id)
+        signature = minhash(text)
+        self._signatures[note_id] = signature
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, set()).add(note_id)
+
+    def remove(self, note_id: str):
+        signature = self._signatures.pop(note_id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(key)
+            if bucket:
+                bucket.discard(note_id)
+                if not bucket:
+                    del buckets[key]
+
+    def find(self, text: str, threshold: float = DUPLICATE_THRESHOLD) -> Optional[tuple[str, float]]:
+        """Most similar indexed note as (note id, estimated Jaccard), if above threshold."""
+        signature = minhash(text)
+
+        candidates = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+
+        best = None
+        for note_id in candidates:
+            similarity = float(np.mean(self._signatures[note_id] == signature))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (note_id, similarity)
+        return best
@@ -1,12 +1,24 @@
 import csv
+import hashlib
 import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
 import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
 from datetime import date
-from typing import Optional
+from typing import Iterator, Optional
 
 from structures.book import Book
+from structures.digest import BookDigest
 from structures.note import Note
 
+logger = logging.getLogger(__name__)
 
 # Only use callouts for tags that benefit from visual distinction
 # Other tags (quote, remark, character) use plain blockquotes
@@ -17,6 +29,29 @@ TAG_CALLOUT_MAP = {
     "connection": "info",
 }
 
+# Number of CSV rows written before a chunk is yielded
+CSV_BATCH_SIZE = 500
+
+# Notes per Parquet row group / JSON Lines chunk
+ROW_GROUP_SIZE = 10_000
+
+# Bookkeeping files stored next to the notes in incremental exports
+MANIFEST_FILENAME = "marginal-ia/.marginal-ia-manifest.json"
+DELETED_FILENAME = "marginal-ia/.marginal-ia-deleted.txt"
+
+# Below this many book files, rendering in-process beats pool overhead
+PARALLEL_MIN_BOOKS = 8
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _callout_lines(text: str) -> list[str]:
+    """Quote every line, so multi-line text stays inside the callout."""
+    if "\n" not in text:
+        return [f"> {text}"]
+    return [f"> {line}" if line else ">" for line in text.split("\n")]
+
 
 def format_note_for_obsidian(note: Note) -> str:
     """Format a single note with tag-aware Obsidian formatting."""
@@ -47,23 +82,23 @@ def format_note_for_obsidian(note: Note) -> str:
 
         if has_quote and has_comment:
             lines.append(f"> [!{callout_type}]")
-            lines.append(f"> {note.quote}")
+            lines.extend(_callout_lines(note.quote))
             lines.append("")
             lines.append(note.comment)
         elif has_quote:
             lines.append(f"> [!{callout_type}]")
-            lines.append(f"> {note.quote}")
+            lines.extend(_callout_lines(note.quote))
         elif has_comment:
             lines.append(f"> [!{callout_type}]")
-            lines.append(f"> {note.comment}")
+            lines.extend(_callout_lines(note.comment))
         elif note.content:
             lines.append(f"> [!{callout_type}]")
-            lines.append(f"> {note.content}")
+            lines.extend(_callout_lines(note.content))
     else:
         # Default: use [!quote] callout for quotes, plain text otherwise
         if has_quote:
             lines.append("> [!quote]")
-            lines.append(f"> {note.quote}")
+            lines.extend(_callout_lines(note.quote))
             if has_comment:
                 lines.append("")
                 lines.append(note.comment)
@@ -82,15 +117,25 @@ def format_note_for_obsidian(note: Note) -> str:
     return "\n".join(lines)
 
 
-def generate_book_markdown(book: Book, notes: list[Note]) -> str:
-    """Generate a complete markdown file for a book with all its notes."""
+def generate_book_markdown(
+    book: Book,
+    notes: list[Note],
+    digest: Optional[BookDigest] = None,
+    exported: Optional[date] = None,
+) -> str:
+    """
+    Generate a complete markdown file for a book with all its notes (and its digest, if any).
+
+    exported is the date written in the frontmatter, today by default.
+    """
     lines = []
+    exported = exported or date.today()
 
     # YAML frontmatter
     lines.append("---")
     lines.append(f'title: "{book.title}"')
     lines.append(f'author: "{book.author}"')
-    lines.append(f"exported: {date.today().isoformat()}")
+    lines.append(f"exported: {exported.isoformat()}")
     lines.append("tags: [book, marginal-ia]")
     lines.append("---")
     lines.append("")
@@ -102,6 +147,19 @@ def generate_book_markdown(book: Book, notes: list[Note]) -> str:
     lines.append("---")
     lines.append("")
 
+    # Generated digest; no "###" headers, so importing the file back skips it
+    if digest:
+        lines.append("## Digest")
+        lines.append("")
+        lines.append(digest.summary)
+        lines.append("")
+        if len(digest.chunks) > 1:
+            for chunk in digest.chunks:
+                lines.append(f"**{chunk.label}** ({chunk.note_count} notes): {chunk.summary}")
+                lines.append("")
+        lines.append("---")
+        lines.append("")
+
     # Separate summary notes from regular notes
     summary_notes = [n for n in notes if n.tags and "summary" in n.tags]
     regular_notes = [n for n in notes if not n.tags or "summary" not in n.tags]
@@ -142,48 +200,242 @@ def sanitize_filename(name: str) -> str:
     return name.strip()
 
 
-def generate_obsidian_export(books: list[Book], notes: list[Note]) -> bytes:
-    """Generate a ZIP file containing markdown files for all books with notes."""
-    # Group notes by book_id
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Seekable write-only buffer that only keeps bytes not yet handed out.
+
+    zipfile seeks back inside the entry it is writing to patch the local
+    header, so the stream has to be seekable for the archive to be identical
+    to one written into a BytesIO. Once an entry is closed its bytes are final
+    and can be drained.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._offset = 0  # Absolute position of self._buffer[0]
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._offset + len(self._buffer)
+        if pos < self._offset:
+            raise io.UnsupportedOperation("cannot seek into drained data")
+        self._pos = pos
+        return pos
+
+    def write(self, data):
+        start = self._pos - self._offset
+        self._buffer[start:start + len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Return and forget every byte written so far."""
+        data = bytes(self._buffer)
+        self._offset += len(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _group_notes_by_book(notes: list[Note]) -> dict[Optional[str], list[Note]]:
+    """Group notes by book_id, keeping the order in which books first appear."""
     notes_by_book: dict[Optional[str], list[Note]] = {}
     for note in notes:
         book_id = note.book_id
         if book_id not in notes_by_book:
             notes_by_book[book_id] = []
         notes_by_book[book_id].append(note)
+    return notes_by_book
+
+
+def _render_book_file(
+    book: Optional[Book],
+    notes: list[Note],
+    digest: Optional[BookDigest] = None,
+    exported: Optional[date] = None,
+) -> tuple[str, str]:
+    """Render one vault file. Runs in worker processes for parallel exports."""
+    if book:
+        filename = f"{sanitize_filename(book.title)} - {sanitize_filename(book.author)}.md"
+        content = generate_book_markdown(book, notes, digest, exported)
+    else:
+        # Notes without a book
+        filename = "Unassigned Notes.md"
+        placeholder_book = Book(title="Unassigned Notes", author="Unknown", id="")
+        content = generate_book_markdown(placeholder_book, notes, exported=exported)
+
+    return f"marginal-ia/{filename}", content
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by every export in this process.
+
+    The pool is created once, sized to the CPU count, and never shut down
+    while exports may still be using it: concurrent sessions submit to the
+    same workers. Workers are spawned rather than forked, since the
+    Streamlit server process is multi-threaded.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """
+    Drop a broken pool so the next parallel export starts a new one.
+
+    Another export may have replaced it already, in which case the new pool
+    is left alone. The broken pool cleans up its own workers.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def iter_book_files(
+    books: list[Book],
+    notes: list[Note],
+    workers: Optional[int] = None,
+    digests: Optional[dict[str, BookDigest]] = None,
+) -> Iterator[tuple[str, str]]:
+    """
+    Yield (path in vault, markdown content) for every book that has notes.
+
+    digests maps book ids to their stored digest, added at the top of the file.
+
+    Books are rendered in the shared process pool when workers > 1, with at
+    most workers * 2 of them in flight. By default workers is the CPU count
+    once there are at least PARALLEL_MIN_BOOKS books. Output order is the
+    same either way. If a worker dies (e.g. killed for memory), the pool is
+    discarded and the remaining books are rendered in-process.
+    """
+    notes_by_book = _group_notes_by_book(notes)
 
     # Create book lookup
     book_lookup = {book.id: book for book in books}
 
-    # Create ZIP in memory
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for book_id, book_notes in notes_by_book.items():
-            if book_id and book_id in book_lookup:
-                book = book_lookup[book_id]
-                filename = f"{sanitize_filename(book.title)} - {sanitize_filename(book.author)}.md"
-                content = generate_book_markdown(book, book_notes)
-            else:
-                # Notes without a book
-                filename = "Unassigned Notes.md"
-                placeholder_book = Book(title="Unassigned Notes", author="Unknown", id="")
-                content = generate_book_markdown(placeholder_book, book_notes)
-
-            zf.writestr(f"marginal-ia/{filename}", content)
+    digests = digests or {}
+    # Dated once here so every file agrees, whichever process renders it
+    exported = date.today()
+    tasks = [
+        (book_lookup.get(book_id) if book_id else None, book_notes, digests.get(book_id), exported)
+        for book_id, book_notes in notes_by_book.items()
+    ]
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(tasks) >= PARALLEL_MIN_BOOKS else 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        for task in tasks:
+            yield _render_book_file(*task)
+        return
+
+    # Keep a bounded number of books in flight so memory stays flat and
+    # concurrent exports share the pool
+    executor = _get_executor()
+    pending = deque()
+    done = 0
+    try:
+        for task in tasks:
+            pending.append(executor.submit(_render_book_file, *task))
+            if len(pending) >= workers * 2:
+                result = pending.popleft().result()
+                done += 1
+                yield result
+        while pending:
+            result = pending.popleft().result()
+            done += 1
+            yield result
+    except BrokenProcessPool as e:
+        logger.warning("Export process pool broke (%s); rendering the remaining %d books in-process",
+                       e, len(tasks) - done)
+        _discard_executor(executor)
+        for task in tasks[done:]:
+            yield _render_book_file(*task)
+    finally:
+        # Free the shared workers if the export was abandoned part-way
+        for future in pending:
+            future.cancel()
+
+
+def iter_obsidian_export(
+    books: list[Book],
+    notes: list[Note],
+    compression: int = zipfile.ZIP_DEFLATED,
+    compresslevel: Optional[int] = None,
+    workers: Optional[int] = None,
+    digests: Optional[dict[str, BookDigest]] = None,
+) -> Iterator[bytes]:
+    """
+    Stream the Obsidian ZIP export, yielding a chunk after each book file.
+
+    Only one book's markdown and compressed data are held in memory at a time.
+    Use compression=zipfile.ZIP_STORED to skip compression entirely.
+    Concatenated chunks are identical to generate_obsidian_export().
+    """
+    buffer = _ChunkBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', compression, compresslevel=compresslevel) as zf:
+        for path, content in iter_book_files(books, notes, workers, digests):
+            zf.writestr(path, content)
+            yield buffer.drain()
+
+    # Central directory, written when the archive is closed
+    yield buffer.drain()
+
+
+def generate_obsidian_export(
+    books: list[Book],
+    notes: list[Note],
+    compression: int = zipfile.ZIP_DEFLATED,
+    compresslevel: Optional[int] = None,
+    workers: Optional[int] = None,
+    digests: Optional[dict[str, BookDigest]] = None,
+) -> bytes:
+    """Generate a ZIP file containing markdown files for all books with notes."""
+    return b"".join(iter_obsidian_export(books, notes, compression, compresslevel, workers, digests))
 
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
 
+def iter_csv_export(books: list[Book], notes: list[Note], batch_size: int = CSV_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Stream the CSV export, yielding UTF-8 encoded chunks of batch_size rows.
 
-def generate_csv_export(books: list[Book], notes: list[Note]) -> bytes:
-    """Generate a CSV file with all notes (importable to Notion and other tools)."""
+    Concatenated chunks are identical to generate_csv_export().
+    """
     # Create book lookup
     book_lookup = {book.id: book for book in books}
 
     csv_buffer = io.StringIO()
     writer = csv.writer(csv_buffer)
 
+    def flush() -> bytes:
+        chunk = csv_buffer.getvalue().encode('utf-8')
+        csv_buffer.seek(0)
+        csv_buffer.truncate()
+        return chunk
+
     # Header row
     writer.writerow([
         "Book Title",
@@ -202,7 +454,7 @@ def generate_csv_export(books: list[Book], notes: list[Note]) -> bytes:
         n.page_number or 0
     ))
 
-    for note in sorted_notes:
+    for i, note in enumerate(sorted_notes, start=1):
         book = book_lookup.get(note.book_id)
         book_title = book.title if book else "Unassigned"
         author = book.author if book else ""
@@ -218,4 +470,180 @@ def generate_csv_export(books: list[Book], notes: list[Note]) -> bytes:
             note.confidence_score or ""
         ])
 
-    return csv_buffer.getvalue().encode('utf-8')
+        if i % batch_size == 0:
+            yield flush()
+
+    chunk = flush()
+    if chunk:
+        yield chunk
+
+
+def generate_csv_export(books: list[Book], notes: list[Note]) -> bytes:
+    """Generate a CSV file with all notes (importable to Notion and other tools)."""
+    return b"".join(iter_csv_export(books, notes))
+
+
+def markdown_hash(content: str) -> str:
+    """
+    Hash a book's markdown, ignoring the export date in the frontmatter.
+
+    Without this the hash of every book would change once a day even if
+    none of its notes did.
+    """
+    digest = hashlib.sha256()
+    # Frontmatter fences seen so far: the date only counts while this is 1
+    fences = 0
+    for line in content.split("\n"):
+        if fences < 2 and line == "---":
+            fences += 1
+        elif fences == 1 and line.startswith("exported: "):
+            continue
+        digest.update(line.encode('utf-8'))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+@dataclass
+class IncrementalExport:
+    """Result of an incremental Obsidian export."""
+    data: bytes
+    manifest: dict[str, str]
+    changed: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+
+
+def generate_incremental_export(
+    books: list[Book],
+    notes: list[Note],
+    previous_manifest: Optional[dict[str, str]] = None,
+    digests: Optional[dict[str, BookDigest]] = None,
+) -> IncrementalExport:
+    """
+    Generate a ZIP with only the book files that changed since the previous export.
+
+    previous_manifest maps vault paths to markdown_hash() values, as returned
+    in IncrementalExport.manifest by the last export. Files that disappeared
+    are listed in DELETED_FILENAME, and the new manifest is stored in the ZIP
+    as MANIFEST_FILENAME so the vault always carries its own state.
+    """
+    previous_manifest = previous_manifest or {}
+    manifest: dict[str, str] = {}
+    changed: list[str] = []
+
+    zip_buffer = io.BytesIO()
+
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for path, content in iter_book_files(books, notes, digests=digests):
+            content_hash = markdown_hash(content)
+            manifest[path] = content_hash
+
+            if previous_manifest.get(path) != content_hash:
+                zf.writestr(path, content)
+                changed.append(path)
+
+        deleted = sorted(path for path in previous_manifest if path not in manifest)
+        if deleted:
+            zf.writestr(DELETED_FILENAME, "\n".join(deleted) + "\n")
+
+        zf.writestr(MANIFEST_FILENAME, json.dumps(manifest, indent=2, sort_keys=True))
+
+    return IncrementalExport(
+        data=zip_buffer.getvalue(),
+        manifest=manifest,
+        changed=changed,
+        deleted=deleted,
+    )
+
+
+def _note_record(note: Note, book: Optional[Book]) -> dict:
+    """Flatten a note and its book into a typed row for columnar exports."""
+    return {
+        "note_id": note.id,
+        "book_id": note.book_id,
+        "book_title": book.title if book else None,
+        "book_author": book.author if book else None,
+        "page_number": note.page_number,
+        "quote": note.quote,
+        "comment": note.comment,
+        "content": note.content,
+        "tags": list(note.tags) if note.tags else [],
+        "confidence_score": float(note.confidence_score) if note.confidence_score is not None else None,
+    }
+
+
+def iter_note_records(books: list[Book], notes: list[Note]) -> Iterator[dict]:
+    """Yield one typed row per note, in the same order as the CSV export."""
+    # Create book lookup
+    book_lookup = {book.id: book for book in books}
+
+    sorted_notes = sorted(notes, key=lambda n: (
+        book_lookup.get(n.book_id, Book(title="", author="")).title,
+        n.page_number or 0
+    ))
+
+    for note in sorted_notes:
+        yield _note_record(note, book_lookup.get(note.book_id))
+
+
+def iter_jsonl_export(books: list[Book], notes: list[Note], batch_size: int = ROW_GROUP_SIZE) -> Iterator[bytes]:
+    """
+    Stream notes as JSON Lines, one object per note.
+
+    Unlike the CSV export, missing values stay null, the page is an integer,
+    the confidence a float and tags a list of strings.
+    """
+    lines = []
+    for record in iter_note_records(books, notes):
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode('utf-8')
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("note_id", pa.string()),
+        ("book_id", pa.string()),
+        ("book_title", pa.string()),
+        ("book_author", pa.string()),
+        ("page_number", pa.int32()),
+        ("quote", pa.string()),
+        ("comment", pa.string()),
+        ("content", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("confidence_score", pa.float64()),
+    ])
+
+
+def iter_parquet_export(books: list[Book], notes: list[Note], row_group_size: int = ROW_GROUP_SIZE) -> Iterator[bytes]:
+    """
+    Stream notes as a Parquet file, yielding a chunk after each row group.
+
+    At most row_group_size notes are materialized as Arrow columns at once.
+    Requires pyarrow (installed with Streamlit).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    buffer = _ChunkBuffer()
+
+    with pq.ParquetWriter(buffer, schema, compression="zstd") as writer:
+        batch = []
+        for record in iter_note_records(books, notes):
+            batch.append(record)
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+                yield buffer.drain()
+
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+    # Footer, written when the writer is closed
+    yield buffer.drain()
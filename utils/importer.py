@@ -0,0 +1,287 @@
+"""
+Bulk import of notes from the CSV and Obsidian markdown export layouts.
+"""
+
+import csv
+import io
+import re
+import uuid
+import zipfile
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from structures.book import Book
+from structures.note import Note
+from utils.export import DELETED_FILENAME, MANIFEST_FILENAME, TAG_CALLOUT_MAP
+from utils.parser import retag_notes
+
+# Notes sent per insert request
+IMPORT_BATCH_SIZE = 500
+
+# Notes sent per LLM re-tagging call
+RETAG_BATCH_SIZE = 25
+
+# Stable namespace so re-importing the same file yields the same note ids
+IMPORT_NAMESPACE = uuid.UUID("6f1c2a7e-5b43-4d0e-9a51-3c8e2f4d7b90")
+
+CALLOUT_RE = re.compile(r"^> \[!(\w+)\]$")
+TAGS_LINE_RE = re.compile(r"^(`#[^`]+`\s*)+$")
+PAGE_HEADER_RE = re.compile(r"^### Page (\d+)$")
+
+
+@dataclass
+class ImportRecord:
+    """A parsed note and the book it belongs to (None for unassigned notes)."""
+    title: Optional[str]
+    author: Optional[str]
+    note: Note
+
+    def book_key(self) -> Optional[tuple[str, str]]:
+        if not self.title:
+            return None
+        return (self.title.strip().lower(), (self.author or "").strip().lower())
+
+
+def _parse_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_csv_import(data: bytes) -> list[ImportRecord]:
+    """Parse a CSV in the layout produced by generate_csv_export()."""
+    # utf-8-sig also accepts files re-saved by Excel
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    records = []
+
+    for row in reader:
+        title = row.get("Book Title") or None
+        author = row.get("Author") or None
+        if title == "Unassigned" and not author:
+            title = None
+
+        tags = [t.strip() for t in (row.get("Tags") or "").split(",") if t.strip()]
+        quote = row.get("Quote") or None
+        comment = row.get("Comment") or None
+
+        note = Note(
+            content=row.get("Content") or comment or quote or "",
+            page_number=_parse_int(row.get("Page")),
+            quote=quote,
+            comment=comment,
+            tags=tags or None,
+            confidence_score=_parse_float(row.get("Confidence")),
+        )
+        records.append(ImportRecord(title=title, author=author, note=note))
+
+    return records
+
+
+def _parse_frontmatter(lines: list[str]) -> tuple[dict, list[str]]:
+    """Split YAML frontmatter (flat `key: value` pairs only) from the body."""
+    if not lines or lines[0] != "---":
+        return {}, lines
+
+    meta = {}
+    for i, line in enumerate(lines[1:], start=1):
+        if line == "---":
+            return meta, lines[i + 1:]
+        if ":" in line:
+            key, value = line.split(":", 1)
+            meta[key.strip()] = value.strip().strip('"')
+
+    return meta, []
+
+
+def _parse_note_block(header: str, body: list[str]) -> Optional[Note]:
+    """Reverse format_note_for_obsidian() for a single note block."""
+    match = PAGE_HEADER_RE.match(header)
+    page_number = int(match.group(1)) if match else None
+
+    # Trim surrounding blank lines
+    while body and not body[0].strip():
+        body.pop(0)
+    while body and not body[-1].strip():
+        body.pop()
+
+    tags = None
+    if body and TAGS_LINE_RE.match(body[-1].strip()):
+        tags = re.findall(r"`#([^`]+)`", body.pop())
+        while body and not body[-1].strip():
+            body.pop()
+
+    callout_type = None
+    callout_lines = []
+    if body:
+        match = CALLOUT_RE.match(body[0])
+        if match:
+            callout_type = match.group(1)
+            body.pop(0)
+            while body and body[0].startswith(">"):
+                callout_lines.append(body.pop(0)[1:].lstrip())
+
+    callout_text = "\n".join(callout_lines).strip() or None
+    plain_text = "\n".join(body).strip() or None
+
+    if callout_type == "quote" or (callout_type in TAG_CALLOUT_MAP.values() and plain_text):
+        quote, comment = callout_text, plain_text
+    elif callout_type:
+        quote, comment = None, callout_text
+    else:
+        quote, comment = None, plain_text
+
+    if not quote and not comment:
+        return None
+
+    return Note(
+        content="\n\n".join(t for t in (quote, comment) if t),
+        page_number=page_number,
+        quote=quote,
+        comment=comment,
+        tags=tags,
+    )
+
+
+def parse_markdown_import(text: str) -> list[ImportRecord]:
+    """Parse a book file in the layout produced by generate_book_markdown()."""
+    meta, lines = _parse_frontmatter(text.replace("\r\n", "\n").split("\n"))
+
+    title = meta.get("title") or None
+    author = meta.get("author") or None
+    if title == "Unassigned Notes":
+        title, author = None, None
+
+    records = []
+    header = None
+    body: list[str] = []
+
+    def close_block():
+        if header is not None:
+            note = _parse_note_block(header, body)
+            if note:
+                records.append(ImportRecord(title=title, author=author, note=note))
+
+    for line in lines:
+        if line.startswith("### "):
+            close_block()
+            header, body = line, []
+        elif line == "---" or line.startswith("## "):
+            close_block()
+            header, body = None, []
+        elif header is not None:
+            body.append(line)
+    close_block()
+
+    return records
+
+
+def parse_import_file(filename: str, data: bytes) -> list[ImportRecord]:
+    """Parse an uploaded .csv, .md or Obsidian export .zip."""
+    name = filename.lower()
+
+    if name.endswith(".csv"):
+        return parse_csv_import(data)
+    if name.endswith(".md"):
+        return parse_markdown_import(data.decode("utf-8"))
+    if name.endswith(".zip"):
+        records = []
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for member in zf.namelist():
+                if member in (MANIFEST_FILENAME, DELETED_FILENAME) or not member.endswith(".md"):
+                    continue
+                records.extend(parse_markdown_import(zf.read(member).decode("utf-8")))
+        return records
+
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+def resolve_books(client, user_id: str, records: list[ImportRecord]) -> dict[tuple[str, str], str]:
+    """
+    Match imported books to the user's library by title and author.
+
+    Missing books are created in a single insert. Returns book_key -> book id.
+    """
+    response = client.table("books").select("id, title, author").eq("user_id", user_id).execute()
+    book_ids = {
+        (b["title"].strip().lower(), (b.get("author") or "").strip().lower()): b["id"]
+        for b in response.data
+    }
+
+    new_books = []
+    for record in records:
+        key = record.book_key()
+        if key and key not in book_ids:
+            book = Book(title=record.title.strip(), author=(record.author or "").strip())
+            book_ids[key] = book.id
+            new_books.append({**asdict(book), "user_id": user_id})
+
+    if new_books:
+        client.table("books").insert(new_books).execute()
+
+    return book_ids
+
+
+def _stable_note_id(user_id: str, record: ImportRecord) -> str:
+    """Derive the note id from its content so a re-run skips imported notes."""
+    note = record.note
+    fingerprint = "\x1f".join(str(v) for v in (
+        user_id, record.title, record.author, note.page_number, note.quote, note.comment, note.content
+    ))
+    return str(uuid.uuid5(IMPORT_NAMESPACE, fingerprint))
+
+
+def import_notes(
+    client,
+    user_id: str,
+    records: list[ImportRecord],
+    book_ids: dict[tuple[str, str], str],
+    retag_client=None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Insert imported notes with one multi-row request per batch.
+
+    Note ids are derived from the note content and duplicates are ignored,
+    so an interrupted import can simply be run again. If retag_client is
+    given, tags are reassigned by the LLM, RETAG_BATCH_SIZE notes per call.
+    progress(done, total) is called after every batch. Returns the number
+    of notes processed.
+    """
+    total = len(records)
+    done = 0
+
+    for start in range(0, total, batch_size):
+        batch = records[start:start + batch_size]
+
+        if retag_client:
+            for i in range(0, len(batch), RETAG_BATCH_SIZE):
+                chunk = [r.note for r in batch[i:i + RETAG_BATCH_SIZE]]
+                tags = retag_notes(chunk, retag_client)
+                if tags:
+                    for note, note_tags in zip(chunk, tags):
+                        note.tags = note_tags or None
+
+        rows = []
+        for record in batch:
+            note = record.note
+            note.id = _stable_note_id(user_id, record)
+            key = record.book_key()
+            note.book_id = book_ids.get(key) if key else None
+            rows.append({**asdict(note), "user_id": user_id})
+
+        client.table("notes").upsert(rows, on_conflict="id", ignore_duplicates=True).execute()
+
+        done += len(batch)
+        if progress:
+            progress(done, total)
+
+    return done
@@ -2,7 +2,6 @@
 ISBN lookup utilities using the Open Library API.
 """
 
-import requests
 from dataclasses import dataclass
 from typing import Optional
 
@@ -32,6 +31,9 @@ def lookup_isbn(isbn: str) -> Optional[BookInfo]:
     if not clean_isbn:
         return None
 
+    # Imported here so the sidebar does not load requests on every cold start
+    import requests
+
     try:
         # Use Open Library Books API
         url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{clean_isbn}&format=json&jscmd=data"
@@ -0,0 +1,264 @@
+"""
+In-process metrics for the voice-to-note pipeline.
+
+Counters and histograms are kept in memory, shared by every session of the
+server process, and rendered in the OpenMetrics text format. Set
+METRICS_PORT to serve them on /metrics for Prometheus.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+AUDIO_SECONDS_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+
+# Recent observations kept per series for p50/p95/p99
+QUANTILE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _quantiles(values: list[float], qs: tuple) -> dict[float, float]:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {q: values[min(int(q * len(values)), len(values) - 1)] for q in qs}
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.help_text}"]
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}_total{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, unit: str = ""):
+        self.name = name
+        self.help_text = help_text
+        self.unit = unit
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                    "recent": deque(maxlen=QUANTILE_WINDOW),
+                }
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+
+    def quantiles(self, qs: tuple = QUANTILES) -> dict[tuple, dict[float, float]]:
+        """Quantiles of the recent observations, per label set."""
+        with _lock:
+            recent = {key: list(series["recent"]) for key, series in self._series.items()}
+        return {key: _quantiles(values, qs) for key, values in recent.items() if values}
+
+    def render(self) -> list[str]:
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.help_text}"]
+        if self.unit:
+            lines.insert(1, f"# UNIT {self.name} {self.unit}")
+        with _lock:
+            series_items = sorted(
+                (key, list(s["counts"]), s["sum"], s["count"]) for key, s in self._series.items()
+            )
+        for key, counts, total, count in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        return lines
+
+    def render_summary(self) -> list[str]:
+        """p50/p95/p99 over the last QUANTILE_WINDOW observations, as a summary family."""
+        # OpenMetrics wants the unit last: marginal_stage_seconds -> marginal_stage_recent_seconds
+        base = self.name.removesuffix(f"_{self.unit}") if self.unit else self.name
+        name = f"{base}_recent_{self.unit}" if self.unit else f"{base}_recent"
+        lines = [f"# TYPE {name} summary", f"# HELP {name} {self.help_text} Recent quantiles."]
+        if self.unit:
+            lines.insert(1, f"# UNIT {name} {self.unit}")
+        with _lock:
+            recent = sorted((key, list(s["recent"])) for key, s in self._series.items())
+        for key, values in recent:
+            for q, value in _quantiles(values, QUANTILES).items():
+                lines.append(f"{name}{_format_labels(key, ('quantile', str(q)))} {value}")
+            lines.append(f"{name}_count{_format_labels(key)} {len(values)}")
+            lines.append(f"{name}_sum{_format_labels(key)} {sum(values)}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "marginal_stage_seconds",
+    "Duration of each voice-to-note pipeline stage.",
+    LATENCY_BUCKETS,
+    unit="seconds",
+)
+STAGE_ERRORS = Counter(
+    "marginal_stage_errors",
+    "Pipeline stages that raised an error.",
+)
+AUDIO_SECONDS = Histogram(
+    "marginal_audio_duration_seconds",
+    "Length of recorded audio.",
+    AUDIO_SECONDS_BUCKETS,
+    unit="seconds",
+)
+AUDIO_BYTES = Histogram(
+    "marginal_audio_bytes",
+    "Size of the WAV sent for transcription.",
+    BYTES_BUCKETS,
+    unit="bytes",
+)
+LLM_TOKENS = Counter(
+    "marginal_llm_tokens",
+    "Tokens used by LLM calls, by kind (prompt, completion, or cached prompt tokens).",
+)
+
+PARSE_ROUTES = Counter(
+    "marginal_parse_routes",
+    "Note parsing calls, by model and the reason it was chosen.",
+)
+
+REGISTRY = [STAGE_SECONDS, STAGE_ERRORS, AUDIO_SECONDS, AUDIO_BYTES, LLM_TOKENS, PARSE_ROUTES]
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """Time a pipeline stage into STAGE_SECONDS; errors are counted, then re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, **labels)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+def provider_of(client) -> str:
+    """Provider label for an OpenAI-compatible client."""
+    base_url = str(getattr(client, "base_url", ""))
+    if "groq" in base_url:
+        return "groq"
+    if "openai" in base_url:
+        return "openai"
+    return "other"
+
+
+class TokenUsage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+
+
+def record_usage(response, provider: str, model: str) -> Optional[TokenUsage]:
+    """
+    Count prompt, completion and cached prompt tokens from a chat completion
+    response, and return them (None if the response has no usage).
+    """
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = TokenUsage(
+        prompt_tokens=usage.prompt_tokens or 0,
+        completion_tokens=usage.completion_tokens or 0,
+        # Prompt tokens served from the provider's prompt cache, when reported
+        cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0,
+    )
+    LLM_TOKENS.inc(counts.prompt_tokens, kind="prompt", provider=provider, model=model)
+    LLM_TOKENS.inc(counts.completion_tokens, kind="completion", provider=provider, model=model)
+    if counts.cached_tokens:
+        LLM_TOKENS.inc(counts.cached_tokens, kind="cached", provider=provider, model=model)
+    return counts
+
+
+def render_openmetrics() -> str:
+    """All metrics in the OpenMetrics text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(STAGE_SECONDS.render_summary())
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_openmetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics in a daemon thread on port (default: METRICS_PORT env var, off if unset)."""
+    port = port or int(os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics server not started on port %s: %s", port, e)
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
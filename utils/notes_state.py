@@ -0,0 +1,186 @@
+"""
+Per-session copy of the user's notes, kept in sync with the database.
+
+The notes are fetched once per session into a NoteTable with a NoteIndex
+on top (plus per-book DuplicateIndexes, built on first use). Related-notes
+search uses one RelatedNotesIndex per user, shared by all their sessions in
+the server process. Pages that write notes update them incrementally
+instead of refetching everything.
+"""
+
+import threading
+import streamlit as st
+from dataclasses import replace
+from typing import Iterable, Optional
+from structures.note import Note
+from structures.note_index import NoteIndex
+from structures.note_table import NoteTable
+from utils.db import get_authenticated_client
+from utils.decode import decode_note_table
+from utils.related import RelatedNotesIndex
+from utils.dedup import DuplicateIndex, note_text
+
+# Users whose related-notes index stays in memory (each 30k notes take ~46 MB)
+RELATED_INDEX_USERS = 32
+
+
+def load_notes(user_id: str) -> tuple[NoteTable, NoteIndex]:
+    """Returns the session's notes and index, fetching them if needed."""
+    # Also reload when another user signs in within the same browser session
+    if (
+        "notes" not in st.session_state
+        or st.session_state.get("notes_stale", True)
+        or st.session_state.get("notes_user_id") != user_id
+    ):
+        try:
+            client = get_authenticated_client()
+            response = client.table("notes").select("*").eq("user_id", user_id).execute()
+            st.session_state.notes = decode_note_table(response.data)
+        except Exception as e:
+            st.error(f"Error fetching notes: {e}")
+            st.session_state.notes = NoteTable()
+        st.session_state.note_index = NoteIndex(st.session_state.notes)
+        # The shared related-notes index is synced with these notes on next use
+        st.session_state.pop("related_synced_to", None)
+        st.session_state.pop("duplicate_indexes", None)
+        st.session_state.notes_user_id = user_id
+        st.session_state.notes_stale = False
+
+    return st.session_state.notes, st.session_state.note_index
+
+
+@st.cache_resource(max_entries=RELATED_INDEX_USERS)
+def _related_index_for(user_id: str) -> tuple[RelatedNotesIndex, threading.Lock]:
+    """The user's related-notes index and the lock guarding it, shared across sessions."""
+    return RelatedNotesIndex(), threading.Lock()
+
+
+def related_notes(note_id: str, k: int = 5, other_books_only: bool = False) -> list[tuple[str, float]]:
+    """
+    Top-k (note id, similarity) pairs for one of the session's notes.
+
+    The first call after the session's notes were (re)loaded syncs the shared
+    index with them: only notes added, edited or deleted since it was last
+    synced are embedded again, so the full build happens once per user.
+    """
+    index, lock = _related_index_for(st.session_state.notes_user_id)
+    with lock:
+        # id() also catches an index rebuilt after being evicted from the cache
+        if st.session_state.get("related_synced_to") != id(index):
+            index.sync(st.session_state.notes)
+            st.session_state.related_synced_to = id(index)
+        return index.related(note_id, k=k, other_books_only=other_books_only)
+
+
+def _update_related(notes: Iterable[Note] = (), removed_ids: Iterable[str] = ()):
+    """Applies the session's writes to the shared related-notes index."""
+    index, lock = _related_index_for(st.session_state.notes_user_id)
+    with lock:
+        for note in notes:
+            index.update(note)
+        for note_id in removed_ids:
+            index.remove(note_id)
+
+
+def get_duplicate_index(user_id: str, book_id: Optional[str]) -> DuplicateIndex:
+    """Returns the duplicate index for one of the user's books, building it on first use."""
+    indexes = st.session_state.setdefault("duplicate_indexes", {})
+    key = (user_id, book_id)
+
+    if key not in indexes:
+        index = DuplicateIndex()
+        if _is_loaded() and st.session_state.get("notes_user_id") == user_id:
+            note_table = st.session_state.notes
+            for note in note_table.notes(note_table.book_rows(book_id)):
+                index.add(note.id, note_text(note))
+        else:
+            client = get_authenticated_client()
+            query = client.table("notes").select("id, content, quote").eq("user_id", user_id)
+            query = query.eq("book_id", book_id) if book_id else query.is_("book_id", "null")
+            for row in query.execute().data:
+                index.add(row["id"], " ".join(t for t in (row.get("content"), row.get("quote")) if t))
+        indexes[key] = index
+
+    return indexes[key]
+
+
+def _duplicate_indexes_for(book_id: Optional[str]) -> list[DuplicateIndex]:
+    indexes = st.session_state.get("duplicate_indexes", {})
+    return [index for (_, indexed_book), index in indexes.items() if indexed_book == book_id]
+
+
+def mark_notes_stale():
+    """Forces a refetch on the next load_notes() call (e.g. after an import)."""
+    st.session_state.notes_stale = True
+    # Built from the same notes: rebuilt on next use, with imported notes
+    st.session_state.pop("duplicate_indexes", None)
+
+
+def _is_loaded() -> bool:
+    return "notes" in st.session_state and not st.session_state.get("notes_stale", True)
+
+
+def add_note(note: Note):
+    """Records a note that was just inserted in the database."""
+    for index in _duplicate_indexes_for(note.book_id):
+        index.add(note.id, note_text(note))
+
+    if _is_loaded():
+        st.session_state.notes.append(note)
+        st.session_state.note_index.add(note)
+        _update_related([note])
+
+
+def update_note(note: Note):
+    """Records a note that was just updated in the database."""
+    update_notes([note])
+
+
+def update_notes(notes: list[Note]):
+    """Records notes that were just updated in the database (e.g. by a bulk action)."""
+    for note in notes:
+        # The note may have moved to another book
+        for index in st.session_state.get("duplicate_indexes", {}).values():
+            index.remove(note.id)
+        for index in _duplicate_indexes_for(note.book_id):
+            index.add(note.id, note_text(note))
+
+    if _is_loaded():
+        notes = [note for note in notes if note.id in st.session_state.notes]
+        for note in notes:
+            st.session_state.notes.update(note)
+            st.session_state.note_index.update(note)
+        _update_related(notes)
+
+
+def remove_notes(note_ids: list[str]):
+    """Records notes that were just deleted from the database."""
+    for index in st.session_state.get("duplicate_indexes", {}).values():
+        for note_id in note_ids:
+            index.remove(note_id)
+
+    if _is_loaded():
+        st.session_state.notes.remove(note_ids)
+        for note_id in note_ids:
+            st.session_state.note_index.remove(note_id)
+        _update_related(removed_ids=note_ids)
+
+
+def remove_books(book_ids: list[str]):
+    """Records books that were just deleted, along with their notes."""
+    indexes = st.session_state.get("duplicate_indexes", {})
+    for key in [key for key in indexes if key[1] in book_ids]:
+        del indexes[key]
+
+    if _is_loaded():
+        note_table = st.session_state.notes
+        rows = [row for book_id in book_ids for row in note_table.book_rows(book_id)]
+        remove_notes([note_table.ids[row] for row in rows])
+
+
+def move_book_notes(book_ids: list[str], into_book_id: str):
+    """Records that every note of the given books was just moved to another book."""
+    if _is_loaded():
+        note_table = st.session_state.notes
+        rows = [row for book_id in book_ids for row in note_table.book_rows(book_id)]
+        update_notes([replace(note, book_id=into_book_id) for note in note_table.notes(rows)])
@@ -1,86 +1,250 @@
 import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from textwrap import dedent
+from typing import Optional
 import streamlit as st
+from utils.metrics import timed, provider_of, record_usage, PARSE_ROUTES
 
-def parse_note_content(raw_text, client):
+logger = logging.getLogger(__name__)
+
+PARSE_MODEL = "llama-3.3-70b-versatile"
+
+# Tried first for short, single-part transcripts
+FAST_PARSE_MODEL = "llama-3.1-8b-instant"
+
+PREDEFINED_TAGS = ["character", "question", "remark", "quote", "summary", "idea", "connection", "critique"]
+
+# Keys a parse may return: they become Note fields
+PARSE_FIELDS = {"page_number", "quote", "comment", "tags", "confidence_score"}
+
+# --- Model routing ---
+
+# "page 42", "p. 42", "page forty": several of them usually mean several notes in one
+PAGE_MENTION_RE = re.compile(r"\b(?:page|p\.)\s*\w+", re.IGNORECASE)
+SENTENCE_END_RE = re.compile(r"[.!?…]+(?:\s|$)")
+
+
+@dataclass(frozen=True)
+class RoutingPolicy:
     """
-    Uses OpenAI to extract structured fields from raw voice note text.
+    Which model parses a transcript.
+
+    In "auto" mode, transcripts up to max_words words with at most one page
+    mention and max_sentences sentences go to fast_model. Its answer is kept
+    unless it is malformed or its confidence_score is below min_confidence,
+    in which case the transcript is parsed again by large_model. "large"
+    mode always uses large_model.
+    """
+    mode: str = "auto"
+    fast_model: str = FAST_PARSE_MODEL
+    large_model: str = PARSE_MODEL
+    max_words: int = 60
+    max_sentences: int = 4
+    min_confidence: float = 0.8
+
+    @classmethod
+    def from_env(cls) -> "RoutingPolicy":
+        """Reads the MARGINAL_PARSE_* environment variables; unset ones keep the defaults."""
+        default = cls()
+        policy = cls(
+            mode=os.getenv("MARGINAL_PARSE_ROUTING", default.mode),
+            fast_model=os.getenv("MARGINAL_PARSE_FAST_MODEL", default.fast_model),
+            max_words=int(os.getenv("MARGINAL_PARSE_MAX_WORDS", default.max_words)),
+            min_confidence=float(os.getenv("MARGINAL_PARSE_MIN_CONFIDENCE", default.min_confidence)),
+        )
+        if policy.mode not in ("auto", "large"):
+            raise ValueError(f"MARGINAL_PARSE_ROUTING must be 'auto' or 'large', not {policy.mode!r}")
+        return policy
+
+    def route(self, raw_text: str) -> tuple[str, str]:
+        """First model to try and why."""
+        if self.mode == "large":
+            return self.large_model, "forced"
+        if len(raw_text.split()) > self.max_words:
+            return self.large_model, "long"
+        if (
+            len(PAGE_MENTION_RE.findall(raw_text)) > 1
+            or len(SENTENCE_END_RE.findall(raw_text.strip() + " ")) > self.max_sentences
+        ):
+            return self.large_model, "multi_part"
+        return self.fast_model, "short"
+
+    def escalation(self, parsed: Optional[dict]) -> Optional[str]:
+        """Why a fast model's answer should be redone by the large model, or None to keep it."""
+        if not isinstance(parsed, dict) or not parsed.keys() <= PARSE_FIELDS:
+            return "invalid"
+        confidence = parsed.get("confidence_score")
+        if not isinstance(confidence, (int, float)) or confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_routing_policy() -> RoutingPolicy:
+    """The process-wide policy, read from the environment once."""
+    return RoutingPolicy.from_env()
+
+
+# --- Prompts ---
+# The system prompts are built once per process and never contain per-book or
+# per-note text, so every request starts with the same bytes and providers
+# with prompt caching can serve that prefix from cache. Everything that
+# varies goes in the user message.
+
+def _build_parse_prompt() -> str:
+    tags_list_str = ", ".join(PREDEFINED_TAGS)
+
+    return dedent(f"""\
+        You are an expert editor and structuring assistant for voice notes about books.
+        Clean up the user's spoken stream of consciousness into a structured JSON note.
+
+        **IMPORTANT: Preserve the original language of the input. Do NOT translate. If the input is in French, output in French. If mixed languages, keep them as-is.**
+
+        ### INPUT
+        The user message names the book being read (or "unknown"), then gives the raw transcript. The speaker may stutter, repeat themselves or change their mind, and names or places from the book may be misspelled phonetically.
+
+        ### RULES
+        1. **Entity fixing (critical):** use your knowledge of the book to correct names, places and terms transcribed phonetically, e.g. "Cat-ness" -> "Katniss" in The Hunger Games.
+        2. **Quote vs. comment:** text the user reads out ("Quote", "It says", verbatim text) goes in "quote"; their own analysis ("I think", "This reminds me") goes in "comment".
+        3. **Page number:** from "Page X", "p. X" or a number given as a location; the last one if they correct themselves. Integer or null.
+        4. **Tags:** 1 to 3 tags from this PREDEFINED LIST: [{tags_list_str}]. Only create a NEW tag if none of them fit.
+        5. **Cleanup:** fix grammar and remove filler words ("um", "uh", "like") in the quote and comment, keeping the meaning.
+        6. **confidence_score:** from 0 to 1, how sure you are of the structure and corrections.
+
+        ### EXAMPLES
+        Book: "Ten Essays" by unknown
+        Transcript: Okay on page 42 uh wait no page 45. It says that happiness is a choice. I think that's controversial because circumstances matter.
+        {{"page_number": 45, "quote": "Happiness is a choice.", "comment": "This is controversial; circumstances also play a huge role.", "tags": ["critique", "idea"], "confidence_score": 1.0}}
+
+        Book: "Dune" by Frank Herbert
+        Transcript: This reminds me of the character Hark on in. He is so evil.
+        {{"page_number": null, "quote": null, "comment": "Reminds me of the character Harkonnen. He is so evil.", "tags": ["character", "connection"], "confidence_score": 0.95}}
+
+        Return ONLY the JSON object for the transcript in the user message.""")
+
+
+PARSE_SYSTEM_PROMPT = _build_parse_prompt()
+
+
+def _parse_user_message(raw_text: str, book) -> str:
+    """The per-request part of the parse prompt: the book, then the transcript."""
+    book_line = f'"{book.title}" by {book.author or "unknown"}' if book else "unknown"
+    return f"Book: {book_line}\nTranscript: {raw_text}"
+
+
+def _report_usage(response, provider: str, model: str, stage: str):
+    """Count the response's tokens and log them for this request."""
+    usage = record_usage(response, provider, model)
+    if usage:
+        logger.info(
+            "%s with %s: %d prompt tokens (%d cached), %d completion tokens",
+            stage, model, usage.prompt_tokens, usage.cached_tokens, usage.completion_tokens,
+        )
+
+
+def _complete_parse(client, provider, model, user_message) -> Optional[dict]:
+    try:
+        with timed("parse", provider=provider, model=model):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": PARSE_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_message}
+                ],
+                response_format={"type": "json_object"}
+            )
+            _report_usage(response, provider, model, "parse")
+
+            return json.loads(response.choices[0].message.content)
+
+    except Exception as e:
+        logger.warning("Parsing error (%s, %s): %s", provider, model, e)
+        return None
+
+
+def parse_note_content(raw_text, client, policy: Optional[RoutingPolicy] = None):
     """
+    Uses OpenAI to extract structured fields from raw voice note text.
 
-    if st.session_state.current_book_obj:
-        current_book_title = st.session_state.current_book_obj.title  # e.g. "Dune"
-        current_book_author = st.session_state.current_book_obj.author # e.g. "Frank Herbert"
-    else:
-        current_book_title = None
-        current_book_author = None
+    The model is picked by the routing policy (see RoutingPolicy); every
+    decision is logged and counted in PARSE_ROUTES.
+    """
+    policy = policy or get_routing_policy()
+    user_message = _parse_user_message(raw_text, st.session_state.current_book_obj)
+    provider = provider_of(client)
 
-    predefined_tags = ["character", "question", "remark", "quote", "summary", "idea", "connection", "critique"]
-    tags_list_str = ", ".join(predefined_tags)
+    model, reason = policy.route(raw_text)
+    logger.info("Parsing with %s (%s, %d words)", model, reason, len(raw_text.split()))
+    PARSE_ROUTES.inc(model=model, reason=reason)
+    parsed = _complete_parse(client, provider, model, user_message)
 
-    system_prompt = f"""
-    You are an expert editor and structuring assistant for voice notes.
-    The user is currently reading the book: **"{current_book_title}" by {current_book_author}** (ignore if None).
+    if model == policy.large_model:
+        return parsed
 
-    **IMPORTANT: Preserve the original language of the input. Do NOT translate. If the input is in French, output in French. If mixed languages, keep them as-is.**
+    escalation = policy.escalation(parsed)
+    if not escalation:
+        return parsed
 
-    Your goal is to clean up the user's spoken stream of consciousness into a structured JSON note.
+    logger.info("Escalating parse from %s to %s (%s)", model, policy.large_model, escalation)
+    PARSE_ROUTES.inc(model=policy.large_model, reason=escalation)
+    escalated = _complete_parse(client, provider, policy.large_model, user_message)
 
-    ### INPUT DATA
-    You will receive a raw transcript of a user speaking. They might stutter, repeat themselves, or change their mind.
-    The transcript may contain phonetic misspellings of names or places specific to this book.
+    # A low-confidence answer beats none if the large model fails
+    if escalated is None and escalation == "low_confidence":
+        return parsed
+    return escalated
 
-    ### PARSING RULES
-    1. **CONTEXT & ENTITY FIXING (CRITICAL):** - Use your knowledge of the book "{current_book_title}" to CORRECT any names, places, or specific terms that were transcribed phonetically. 
-    - Example: If the audio says "Cat-ness", correct it to "Katniss" (if the book is Hunger Games).
 
-    2. **Quote vs. Comment:** - If the user says "Quote", "It says", or reads text verbatim, put that in "quote".
-    - If the user says "I think", "This reminds me", or analyzes the text, put that in "comment".
+def _build_retag_prompt() -> str:
+    tags_list_str = ", ".join(PREDEFINED_TAGS)
 
-    3. **Page Numbers:** - Look for "Page X", "p. X", or just numbers mentioned in context of location. Return as integer or null.
+    return dedent(f"""\
+        You categorize reading notes. For each note, choose 1 to 3 tags from this PREDEFINED LIST: [{tags_list_str}].
+        Only create a NEW tag if absolutely necessary and none of the predefined tags fit.
 
-    4. **Tags:** - You MUST categorize the note using tags from this PREDEFINED LIST: [{tags_list_str}].
-    - You may select 1 to 3 tags.
-    - Only create a NEW tag if absolutely necessary and none of the predefined tags fit.
+        You will receive a JSON object {{"notes": [{{"index": 0, "quote": ..., "comment": ..., "content": ...}}, ...]}}.
+        Return ONLY a JSON object {{"tags": [["tag", ...], ...]}} with one list per note, in the same order.""")
 
-    5. **Cleanup:** - Fix grammar and remove filler words ("um", "uh", "like") in the comment/quote, but keep the meaning.
 
-    ### EXAMPLES
+RETAG_SYSTEM_PROMPT = _build_retag_prompt()
 
-    **Input:** "Okay on page 42 uh wait no page 45. It says that happiness is a choice. I think that's controversial because circumstances matter."
-    **Output:**
-    {{
-    "page_number": 45,
-    "quote": "Happiness is a choice.",
-    "comment": "This is controversial; circumstances also play a huge role.",
-    "tags": ["critique", "idea"],
-    "confidence_score": 1.0
-    }}
 
-    **Input:** "This reminds me of the character Hark on in. He is so evil." (Assuming Book is 'Dune')
-    **Output:**
-    {{
-    "page_number": null,
-    "quote": null,
-    "comment": "Reminds me of the character Harkonnen. He is so evil.",
-    "tags": ["character", "connection"],
-    "confidence_score": 0.95
-    }}
+def retag_notes(notes, client):
+    """
+    Assigns tags to a batch of notes in a single LLM call.
 
-    ### YOUR TASK
-    Return ONLY the JSON object for the following transcript.
+    Returns a list of tag lists aligned with `notes`, or None on failure.
     """
+    payload = {
+        "notes": [
+            {"index": i, "quote": n.quote, "comment": n.comment, "content": n.content}
+            for i, n in enumerate(notes)
+        ]
+    }
+
+    provider = provider_of(client)
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Here is the raw text: {raw_text}"}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        return json.loads(response.choices[0].message.content)
-        
+        with timed("retag", provider=provider, model=PARSE_MODEL):
+            response = client.chat.completions.create(
+                model=PARSE_MODEL,
+                messages=[
+                    {"role": "system", "content": RETAG_SYSTEM_PROMPT},
+                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+                ],
+                response_format={"type": "json_object"}
+            )
+            _report_usage(response, provider, PARSE_MODEL, "retag")
+
+        tags = json.loads(response.choices[0].message.content).get("tags")
+        if not isinstance(tags, list) or len(tags) != len(notes):
+            return None
+        return tags
+
     except Exception as e:
-        print(f"Parsing error: {e}")
-        return None
\ No newline at end of file
+        logger.warning("Retagging error (%s, %s): %s", provider, PARSE_MODEL, e)
+        return None
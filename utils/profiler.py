@@ -0,0 +1,214 @@
+"""
+Per-rerun profiler for Supabase round-trips and script run time.
+
+Enable for every session with MARGINAL_PROFILE=1. To profile a single
+session on a deployment, set MARGINAL_PROFILE_TOKEN and open the app with
+?profile=<token>; without the token the query parameter is ignored. Every
+Supabase request and auth call made during a rerun is recorded with its
+duration and payload size. Each finished run is appended to a JSONL log
+(MARGINAL_PROFILE_LOG, default profile.jsonl) and shown in a sidebar panel.
+The log is rotated to <log>.1 once it reaches MARGINAL_PROFILE_LOG_MAX_BYTES.
+"""
+
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import streamlit as st
+
+# Runs kept in the session for the debug panel
+HISTORY_SIZE = 20
+
+PROFILE_LOG = os.getenv("MARGINAL_PROFILE_LOG", "profile.jsonl")
+
+# Size at which the log is rotated; one rotated file is kept
+PROFILE_LOG_MAX_BYTES = int(os.getenv("MARGINAL_PROFILE_LOG_MAX_BYTES", 10 * 1024 * 1024))
+
+
+def profiling_enabled() -> bool:
+    if os.getenv("MARGINAL_PROFILE") == "1":
+        return True
+    token = os.getenv("MARGINAL_PROFILE_TOKEN")
+    if not token:
+        return False
+    try:
+        return hmac.compare_digest(st.query_params.get("profile", ""), token)
+    except Exception:
+        return False
+
+
+def _payload_size(data) -> int:
+    try:
+        return len(json.dumps(data, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _record_call(kind: str, target: str, seconds: float, size: int, error: bool = False):
+    run = st.session_state.get("_profile_run")
+    if run is not None:
+        run["calls"].append({
+            "kind": kind,
+            "target": target,
+            "ms": round(seconds * 1000, 2),
+            "bytes": size,
+            "error": error,
+        })
+
+
+# Builder methods that name the kind of request
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class _ProfiledBuilder:
+    """Wraps a postgrest request builder; chained calls stay wrapped, execute() is timed."""
+
+    def __init__(self, builder, target: str):
+        self._builder = builder
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            if name == "execute":
+                start = time.perf_counter()
+                try:
+                    response = attr(*args, **kwargs)
+                except Exception:
+                    _record_call("db", self._target, time.perf_counter() - start, 0, error=True)
+                    raise
+                _record_call("db", self._target, time.perf_counter() - start, _payload_size(response.data))
+                return response
+
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                # e.g. "notes" becomes "notes.select" once the operation is known
+                target = f"{self._target}.{name}" if name in _OPERATIONS else self._target
+                return _ProfiledBuilder(result, target)
+            return result
+
+        return wrapper
+
+
+class _ProfiledAuth:
+    def __init__(self, auth):
+        self._auth = auth
+
+    def __getattr__(self, name):
+        attr = getattr(self._auth, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                _record_call("auth", name, time.perf_counter() - start, 0, error=True)
+                raise
+            _record_call("auth", name, time.perf_counter() - start, 0)
+            return result
+
+        return wrapper
+
+
+class ProfiledClient:
+    """Supabase client proxy that records every request made through it."""
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = _ProfiledAuth(client.auth)
+
+    def table(self, name: str):
+        return _ProfiledBuilder(self._client.table(name), name)
+
+    def rpc(self, fn: str, *args, **kwargs):
+        return _ProfiledBuilder(self._client.rpc(fn, *args, **kwargs), f"rpc:{fn}")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def wrap_client(client):
+    """Returns a profiled proxy for client while a profiled run is active."""
+    if st.session_state.get("_profile_run") is None:
+        return client
+    return ProfiledClient(client)
+
+
+def begin_run():
+    """Starts recording a rerun, if profiling is enabled."""
+    if not profiling_enabled():
+        st.session_state.pop("_profile_run", None)
+        return
+    st.session_state._profile_counter = st.session_state.get("_profile_counter", 0) + 1
+    st.session_state._profile_run = {
+        "run": st.session_state._profile_counter,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "start": time.perf_counter(),
+        "calls": [],
+    }
+
+
+def end_run(page: str):
+    """Finishes the current run: logs it and keeps it for the debug panel."""
+    run = st.session_state.pop("_profile_run", None)
+    if run is None:
+        return
+
+    calls = run["calls"]
+    record = {
+        "run": run["run"],
+        "started_at": run["started_at"],
+        "page": page,
+        "script_ms": round((time.perf_counter() - run["start"]) * 1000, 2),
+        "remote_calls": len(calls),
+        "remote_ms": round(sum(c["ms"] for c in calls), 2),
+        "bytes": sum(c["bytes"] for c in calls),
+        "calls": calls,
+    }
+
+    history = st.session_state.setdefault("_profile_history", [])
+    history.append(record)
+    del history[:-HISTORY_SIZE]
+
+    _append_to_log(json.dumps(record) + "\n")
+
+
+def _append_to_log(line: str):
+    try:
+        if os.path.getsize(PROFILE_LOG) + len(line) > PROFILE_LOG_MAX_BYTES:
+            os.replace(PROFILE_LOG, PROFILE_LOG + ".1")
+    except OSError:
+        # No log yet
+        pass
+    try:
+        with open(PROFILE_LOG, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        pass
+
+
+def render_profiler_panel():
+    """Sidebar panel with the last runs and the calls of the most recent one."""
+    history = st.session_state.get("_profile_history")
+    if not profiling_enabled() or not history:
+        return
+
+    with st.sidebar.expander("Profiler", expanded=False):
+        st.dataframe(
+            [
+                {k: r[k] for k in ("run", "page", "script_ms", "remote_calls", "remote_ms", "bytes")}
+                for r in reversed(history)
+            ],
+            hide_index=True,
+        )
+        last = history[-1]
+        st.caption(f"Run {last['run']} ({last['page']}): {last['remote_calls']} remote calls")
+        if last["calls"]:
+            st.dataframe(last["calls"], hide_index=True)
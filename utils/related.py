@@ -0,0 +1,210 @@
+"""
+Offline related-notes search.
+
+Each note's quote and comment are embedded locally with signed feature
+hashing of words, word pairs and character trigrams, then L2-normalized.
+Vectors live in one NumPy matrix per user, so a lookup is a single
+matrix-vector product: no model download and no API call.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+from structures.note import Note
+
+# Embedding width; 50k notes take 50k * EMBEDDING_DIM * 4 bytes
+EMBEDDING_DIM = 384
+
+# Relative weight of each feature family
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.7
+TRIGRAM_WEIGHT = 0.3
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _note_text(note: Note) -> str:
+    parts = [note.quote, note.comment]
+    if not any(parts):
+        parts = [note.content]
+    return " ".join(p for p in parts if p)
+
+
+def _signature(text: str, book_id: Optional[str]) -> tuple[int, Optional[str]]:
+    """What a note's index row depends on, to tell whether it needs embedding again."""
+    return zlib.crc32(text.encode("utf-8")), book_id
+
+
+def _features(text: str) -> Iterable[tuple[str, float]]:
+    words = [w for w in WORD_RE.findall(text.lower()) if len(w) > 2]
+    for word in words:
+        yield "w:" + word, WORD_WEIGHT
+        # Trigrams make the match robust to plurals, conjugations and typos
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            yield "c:" + padded[i:i + 3], TRIGRAM_WEIGHT
+    for first, second in zip(words, words[1:]):
+        yield f"b:{first} {second}", BIGRAM_WEIGHT
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str) -> tuple[int, float]:
+    """Column and sign for a feature; crc32 is stable across processes, unlike hash()."""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % EMBEDDING_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+def embed_text(text: str) -> np.ndarray:
+    """Embed text into a unit vector of EMBEDDING_DIM floats (all zeros if empty)."""
+    counts: dict[str, float] = {}
+    for feature, weight in _features(text):
+        counts[feature] = counts.get(feature, 0.0) + weight
+
+    if not counts:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    columns, signs = zip(*(_bucket(feature) for feature in counts))
+    weights = np.log1p(np.fromiter(counts.values(), dtype=np.float64, count=len(counts))) * signs
+    vector = np.bincount(columns, weights=weights, minlength=EMBEDDING_DIM).astype(np.float32)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class RelatedNotesIndex:
+    """
+    Nearest-neighbour index over a user's notes, updated one note at a time.
+
+    Rows of the matrix are slots; removed notes leave a zero row that is
+    reused by the next insert. Not thread-safe: callers sharing an index
+    across sessions hold a lock around every call.
+    """
+
+    __slots__ = (
+        "_matrix", "_ids", "_book_codes", "_book_index", "_slot_by_id", "_signatures", "_free", "_size",
+    )
+
+    def __init__(self, notes: Iterable[Note] = ()):
+        notes = list(notes)
+        capacity = max(len(notes), 16)
+        self._matrix = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        self._ids: list[Optional[str]] = []
+        # Dictionary-encoded book per slot, -1 for none
+        self._book_codes = np.full(capacity, -1, dtype=np.int32)
+        self._book_index: dict[str, int] = {}
+        self._slot_by_id: dict[str, int] = {}
+        self._signatures: dict[str, tuple[int, Optional[str]]] = {}
+        self._free: list[int] = []
+        self._size = 0
+
+        for note in notes:
+            self.add(note)
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._slot_by_id
+
+    def _book_code(self, book_id: Optional[str]) -> int:
+        if not book_id:
+            return -1
+        return self._book_index.setdefault(book_id, len(self._book_index))
+
+    def add(self, note: Note):
+        if note.id in self._slot_by_id:
+            self.update(note)
+            return
+
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = note.id
+        else:
+            slot = self._size
+            if slot == len(self._matrix):
+                grown = np.zeros((len(self._matrix) * 2, EMBEDDING_DIM), dtype=np.float32)
+                grown[:slot] = self._matrix
+                self._matrix = grown
+                self._book_codes = np.concatenate([self._book_codes, np.full(slot, -1, dtype=np.int32)])
+            self._ids.append(note.id)
+            self._size += 1
+
+        self._slot_by_id[note.id] = slot
+        self._embed(slot, note)
+
+    def update(self, note: Note):
+        slot = self._slot_by_id.get(note.id)
+        if slot is None:
+            self.add(note)
+            return
+        self._embed(slot, note)
+
+    def _embed(self, slot: int, note: Note):
+        text = _note_text(note)
+        self._book_codes[slot] = self._book_code(note.book_id)
+        self._matrix[slot] = embed_text(text)
+        self._signatures[note.id] = _signature(text, note.book_id)
+
+    def remove(self, note_id: str):
+        slot = self._slot_by_id.pop(note_id, None)
+        if slot is None:
+            return
+        del self._signatures[note_id]
+        self._matrix[slot] = 0.0
+        self._ids[slot] = None
+        self._book_codes[slot] = -1
+        self._free.append(slot)
+
+    def sync(self, notes: Iterable[Note]):
+        """
+        Bring the index in line with notes: embed new and edited notes, drop missing ones.
+
+        Unchanged notes are not embedded again, so syncing an index that is
+        already up to date costs one checksum per note.
+        """
+        seen = set()
+        for note in notes:
+            seen.add(note.id)
+            if self._signatures.get(note.id) != _signature(_note_text(note), note.book_id):
+                self.add(note)
+        for note_id in [note_id for note_id in self._slot_by_id if note_id not in seen]:
+            self.remove(note_id)
+
+    def _top_k(self, vector: np.ndarray, k: int, exclude_slot: int = -1,
+               exclude_book_code: int = -1, min_score: float = 0.0) -> list[tuple[str, float]]:
+        scores = self._matrix[:self._size] @ vector
+        if exclude_slot >= 0:
+            scores[exclude_slot] = -1.0
+        if exclude_book_code >= 0:
+            scores[self._book_codes[:self._size] == exclude_book_code] = -1.0
+
+        k = min(k, self._size)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            (self._ids[slot], float(scores[slot]))
+            for slot in top
+            if scores[slot] > min_score and self._ids[slot] is not None
+        ]
+
+    def related(self, note_id: str, k: int = 5, other_books_only: bool = False,
+                min_score: float = 0.1) -> list[tuple[str, float]]:
+        """Top-k (note id, cosine similarity) pairs for a note, best first."""
+        slot = self._slot_by_id.get(note_id)
+        if slot is None:
+            return []
+        exclude_book_code = int(self._book_codes[slot]) if other_books_only else -1
+        return self._top_k(self._matrix[slot].copy(), k, slot, exclude_book_code, min_score)
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.1) -> list[tuple[str, float]]:
+        """Top-k notes related to free text."""
+        return self._top_k(embed_text(text), k, min_score=min_score)
@@ -3,6 +3,7 @@ from structures.book import Book
 from dataclasses import asdict
 from utils.db import get_authenticated_client
 from utils.isbn import lookup_isbn, is_valid_isbn
+from utils.decode import decode_books
 
 @st.cache_data(show_spinner=False)
 def get_user_books(user_id: str):
@@ -19,13 +20,7 @@ def get_user_books(user_id: str):
         client = get_authenticated_client()
         # CRITICAL: Always filter by user_id
         response = client.table("books").select("*").eq("user_id", user_id).execute()
-        books = []
-        for b in response.data:
-            # Nettoyage des champs qui ne sont pas dans la dataclass Book
-            if "user_id" in b: del b["user_id"]
-            if "created_at" in b: del b["created_at"]
-            books.append(Book(**b))
-        return books
+        return decode_books(response.data)
     except Exception:
         # Silently return empty list if not authenticated yet
         return []
@@ -0,0 +1,272 @@
+"""
+Book digests: automatic per-book summaries built by map-reduce.
+
+A book's notes are split into fixed page ranges. Each range is summarized
+on its own (map), and the range summaries are merged into a book summary
+(reduce). Every summary is stored in the book_summaries table with the hash
+of what it was built from. Adding a note therefore only re-summarizes its
+page range and the final reduce; unchanged books cost no LLM call at all.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from textwrap import dedent
+from typing import Optional
+
+import streamlit as st
+
+from structures.book import Book
+from structures.digest import BookDigest, ChunkSummary
+from structures.note import Note
+from utils.db import get_authenticated_client
+from utils.metrics import timed, provider_of, record_usage
+from utils.parser import PARSE_MODEL
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = PARSE_MODEL
+
+# Pages per map chunk; fixed ranges keep a note's chunk stable as notes are added
+PAGES_PER_CHUNK = 50
+
+# Prompt budget per chunk: longer notes are cut, notes past the budget left out
+NOTE_MAX_CHARS = 800
+CHUNK_MAX_CHARS = 12_000
+
+# Map calls in flight at once
+SUMMARY_WORKERS = 4
+
+BOOK_KEY = "book"
+UNPAGED_KEY = "unpaged"
+
+MAP_PROMPT = dedent("""\
+    You summarize a reader's notes on one part of a book: quotes they kept and their own comments.
+    Write 3 to 5 sentences covering the main ideas, events and the reader's reactions in that part.
+    Write in the language of the notes. Do not invent content that is not in the notes.
+    Return only the summary text.""")
+
+REDUCE_PROMPT = dedent("""\
+    You merge summaries of a reader's notes on successive parts of a book into one summary of the book.
+    Write one paragraph of 4 to 8 sentences: the main arc, recurring themes and the reader's overall view.
+    Write in the language of the summaries. Do not invent content that is not in them.
+    Return only the summary text.""")
+
+
+# --- Chunking ---
+
+def _chunk_key(note: Note) -> str:
+    if not note.page_number:
+        return UNPAGED_KEY
+    start = (note.page_number - 1) // PAGES_PER_CHUNK * PAGES_PER_CHUNK + 1
+    return f"pages:{start}-{start + PAGES_PER_CHUNK - 1}"
+
+
+def _chunk_order(key: str) -> tuple[int, int]:
+    if key == UNPAGED_KEY:
+        return (1, 0)
+    return (0, int(key.split(":")[1].split("-")[0]))
+
+
+def chunk_label(key: str) -> str:
+    if key == UNPAGED_KEY:
+        return "Notes without a page"
+    return "Pages " + key.split(":")[1].replace("-", "–")
+
+
+def chunk_notes(notes: list[Note]) -> list[tuple[str, list[Note]]]:
+    """(chunk key, notes) per page range, in page order; notes without a page come last."""
+    chunks: dict[str, list[Note]] = {}
+    for note in notes:
+        chunks.setdefault(_chunk_key(note), []).append(note)
+    for chunk in chunks.values():
+        chunk.sort(key=lambda n: (n.page_number or 0, n.id))
+    return sorted(chunks.items(), key=lambda item: _chunk_order(item[0]))
+
+
+def notes_hash(notes: list[Note]) -> str:
+    """Hash of every note field a summary depends on, independent of note order."""
+    digest = hashlib.sha256()
+    for note in sorted(notes, key=lambda n: n.id):
+        digest.update(repr((note.id, note.page_number, note.quote, note.comment, note.content, note.tags)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _book_hash(chunk_hashes: list[tuple[str, str]]) -> str:
+    return hashlib.sha256(repr(chunk_hashes).encode("utf-8")).hexdigest()
+
+
+# --- LLM calls ---
+
+def _book_line(book: Book) -> str:
+    return f'Book: "{book.title}" by {book.author or "unknown"}'
+
+
+def _format_notes(notes: list[Note]) -> str:
+    lines = []
+    used = 0
+    for i, note in enumerate(notes):
+        parts = []
+        if note.quote:
+            parts.append(f'Quote: "{note.quote}"')
+        if note.comment:
+            parts.append(f"Comment: {note.comment}")
+        if not parts and note.content:
+            parts.append(note.content)
+        page = f"[p. {note.page_number}] " if note.page_number else ""
+        line = f"- {page}{' '.join(parts)}"[:NOTE_MAX_CHARS]
+
+        if used + len(line) > CHUNK_MAX_CHARS:
+            lines.append(f"({len(notes) - i} more notes left out)")
+            break
+        lines.append(line)
+        used += len(line)
+    return "\n".join(lines)
+
+
+def _summarize(client, stage: str, system_prompt: str, user_message: str) -> str:
+    provider = provider_of(client)
+    with timed(stage, provider=provider, model=SUMMARY_MODEL):
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+        )
+        record_usage(response, provider, SUMMARY_MODEL)
+    return response.choices[0].message.content.strip()
+
+
+def summarize_chunk(client, book: Book, key: str, notes: list[Note]) -> str:
+    """Map step: summarize the notes of one page range."""
+    message = f"{_book_line(book)}\nPart: {chunk_label(key)}\n\nNotes:\n{_format_notes(notes)}"
+    return _summarize(client, "summarize_chunk", MAP_PROMPT, message)
+
+
+def reduce_summaries(client, book: Book, chunks: list[ChunkSummary]) -> str:
+    """Reduce step: merge the page range summaries into a book summary."""
+    parts = "\n\n".join(f"{chunk.label}:\n{chunk.summary}" for chunk in chunks)
+    return _summarize(client, "summarize_book", REDUCE_PROMPT, f"{_book_line(book)}\n\n{parts}")
+
+
+# --- Digests ---
+
+def _digest_from_rows(book_id: str, rows: list[dict]) -> Optional[BookDigest]:
+    by_chunk = {row["chunk"]: row for row in rows}
+    book_row = by_chunk.pop(BOOK_KEY, None)
+    if book_row is None:
+        return None
+    return BookDigest(
+        book_id=book_id,
+        summary=book_row["summary"],
+        note_count=book_row["note_count"],
+        chunks=[
+            ChunkSummary(label=chunk_label(key), note_count=by_chunk[key]["note_count"], summary=by_chunk[key]["summary"])
+            for key in sorted(by_chunk, key=_chunk_order)
+        ],
+    )
+
+
+def load_digests(db_client, user_id: str) -> dict[str, BookDigest]:
+    """Stored digests of all the user's books, by book id."""
+    response = db_client.table("book_summaries").select(
+        "book_id, chunk, note_count, summary"
+    ).eq("user_id", user_id).execute()
+
+    rows_by_book: dict[str, list[dict]] = {}
+    for row in response.data:
+        rows_by_book.setdefault(row["book_id"], []).append(row)
+
+    digests = {}
+    for book_id, rows in rows_by_book.items():
+        digest = _digest_from_rows(book_id, rows)
+        if digest:
+            digests[book_id] = digest
+    return digests
+
+
+def summarize_book(db_client, llm_client, user_id: str, book: Book, notes: list[Note]) -> Optional[BookDigest]:
+    """
+    Bring the book's digest up to date with its notes and return it.
+
+    Only page ranges whose notes changed are summarized again, and the
+    reduce step only runs if a range changed. Returns None if the book has
+    no notes.
+    """
+    response = db_client.table("book_summaries").select("*").eq("book_id", book.id).execute()
+    stored = {row["chunk"]: row for row in response.data}
+
+    chunks = chunk_notes(notes)
+    if not chunks:
+        if stored:
+            db_client.table("book_summaries").delete().eq("book_id", book.id).execute()
+        return None
+
+    hashes = [(key, notes_hash(chunk)) for key, chunk in chunks]
+    stale = [
+        (key, chunk) for (key, chunk), (_, chunk_hash) in zip(chunks, hashes)
+        if stored.get(key, {}).get("notes_hash") != chunk_hash
+    ]
+    obsolete = [key for key in stored if key != BOOK_KEY and key not in dict(chunks)]
+
+    logger.info("Summarizing %s: %d of %d page ranges changed", book.title, len(stale), len(chunks))
+
+    # Map: the changed ranges, a few at a time
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        new_summaries = dict(zip(
+            (key for key, _ in stale),
+            executor.map(lambda item: summarize_chunk(llm_client, book, *item), stale),
+        ))
+
+    upserts = []
+    summaries = []
+    for (key, chunk), (_, chunk_hash) in zip(chunks, hashes):
+        summary = new_summaries[key] if key in new_summaries else stored[key]["summary"]
+        summaries.append(ChunkSummary(label=chunk_label(key), note_count=len(chunk), summary=summary))
+        if key in new_summaries:
+            upserts.append({"chunk": key, "notes_hash": chunk_hash, "note_count": len(chunk), "summary": summary})
+
+    # Reduce: only if a range changed (or appeared, or went away)
+    book_hash = _book_hash(hashes)
+    if stored.get(BOOK_KEY, {}).get("notes_hash") == book_hash:
+        book_summary = stored[BOOK_KEY]["summary"]
+    else:
+        # A single range needs no merging
+        book_summary = summaries[0].summary if len(summaries) == 1 else reduce_summaries(llm_client, book, summaries)
+        upserts.append({"chunk": BOOK_KEY, "notes_hash": book_hash, "note_count": len(notes), "summary": book_summary})
+
+    if upserts:
+        db_client.table("book_summaries").upsert(
+            [{"user_id": user_id, "book_id": book.id, **row} for row in upserts],
+            on_conflict="book_id,chunk",
+        ).execute()
+    if obsolete:
+        db_client.table("book_summaries").delete().eq("book_id", book.id).in_("chunk", obsolete).execute()
+
+    return BookDigest(book_id=book.id, summary=book_summary, note_count=len(notes), chunks=summaries)
+
+
+# --- Session cache ---
+
+def get_book_digests(user_id: str) -> dict[str, BookDigest]:
+    """The user's digests, fetched once per session."""
+    if st.session_state.get("book_digests_user_id") != user_id:
+        try:
+            st.session_state.book_digests = load_digests(get_authenticated_client(), user_id)
+        except Exception as e:
+            logger.warning("Could not load book summaries: %s", e)
+            st.session_state.book_digests = {}
+        st.session_state.book_digests_user_id = user_id
+    return st.session_state.book_digests
+
+
+def store_digest(book_id: str, digest: Optional[BookDigest]):
+    """Records a digest that was just written (None: the book has none anymore)."""
+    digests = st.session_state.get("book_digests")
+    if digests is None:
+        return
+    if digest:
+        digests[book_id] = digest
+    else:
+        digests.pop(book_id, None)
@@ -0,0 +1,73 @@
+"""
+Optional background warm-up after the server boots.
+
+Heavy dependencies are imported lazily so the first page renders fast. Set
+MARGINAL_WARMUP=1 to load them in a daemon thread right after boot instead,
+so the first recording or notes page does not pay for them either. This is
+useful on platforms that scale to zero.
+"""
+
+import importlib
+import io
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Imported in this order; the later ones are cheap once the first are loaded
+WARMUP_MODULES = [
+    "supabase",
+    "openai",
+    "numpy",
+    "pydub",
+    "utils.notes_state",
+    "pandas",
+]
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("MARGINAL_WARMUP") == "1"
+
+
+def _step(name: str, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        logger.warning("Warm-up step %s failed: %s", name, e)
+        return
+    logger.info("Warm-up step %s took %.0f ms", name, (time.perf_counter() - start) * 1000)
+
+
+def _dummy_encode():
+    """Encode and decode a short silent clip: loads the WAV writer and starts ffmpeg once."""
+    from pydub import AudioSegment
+
+    buffer = io.BytesIO()
+    AudioSegment.silent(duration=250).export(buffer, format="wav")
+    buffer.seek(0)
+    AudioSegment.from_file(buffer)
+
+
+def warm_up():
+    """Import heavy modules, create the API clients and run a dummy encode."""
+    from utils.clients import get_groq_client
+
+    start = time.perf_counter()
+    for module in WARMUP_MODULES:
+        _step(f"import {module}", lambda: importlib.import_module(module))
+    _step("groq client", get_groq_client)
+    _step("dummy encode", _dummy_encode)
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Run warm_up() in a daemon thread if MARGINAL_WARMUP=1."""
+    if not warmup_enabled():
+        return None
+    thread = threading.Thread(target=warm_up, daemon=True, name="warmup")
+    thread.start()
+    return thread